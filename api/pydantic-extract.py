@@ -6,13 +6,24 @@ Tries models in order:
 1. OpenAI (if OPENAI_API_KEY set)
 2. Anthropic (if ANTHROPIC_API_KEY set)
 3. Google (if GOOGLE_API_KEY set)
+
+The first configured provider is called immediately. If it hasn't answered
+within its recent p95 latency (or fails), the next provider is started as a
+hedge and the first valid ExtractionResult wins. Everything is bounded by a
+per-request deadline.
 """
 from http.server import BaseHTTPRequestHandler
+from collections import deque
 import json
 import os
 import asyncio
+import sys
+import time
 from pydantic import BaseModel, Field
-from pydantic_ai import Agent
+
+# Shared with repo-agent; bundled into this function via includeFiles in vercel.json
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "repo-agent"))
+import http_pool
 
 
 # Pydantic models for structured output
@@ -29,9 +40,75 @@ class ExtractionResult(BaseModel):
     should_confirm: bool = Field(default=False)
 
 
-# Use Anthropic Claude (user has credit)
+# (name, API key env var, model) in fallback order
+PROVIDERS = [
+    ("openai", "OPENAI_API_KEY", "openai:gpt-4o-mini"),
+    ("anthropic", "ANTHROPIC_API_KEY", "anthropic:claude-3-haiku-20240307"),
+    ("google", "GOOGLE_API_KEY", "google-gla:gemini-2.0-flash"),
+]
+MODELS = {name: model for name, _, model in PROVIDERS}
+
+# Whole-request budget; a request body may ask for less via deadline_ms
+DEADLINE_MS = int(os.environ.get("EXTRACTION_DEADLINE_MS", "10000"))
+# Hedge delay used until a provider has enough samples for a p95
+HEDGE_DELAY_MS = int(os.environ.get("HEDGE_DELAY_MS", "2500"))
+HEDGE_MIN_DELAY_MS = int(os.environ.get("HEDGE_MIN_DELAY_MS", "500"))
+HEDGE_MIN_SAMPLES = 20
+
+
+def get_providers() -> list[str]:
+    """Providers with an API key configured, in fallback order"""
+    return [name for name, key, _ in PROVIDERS if os.environ.get(key)]
+
+
 def get_model():
-    return "anthropic:claude-3-haiku-20240307"
+    providers = get_providers()
+    return MODELS[providers[0]] if providers else None
+
+
+class ProviderStats:
+    """Rolling latency window and outcome counters for one provider"""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=200)
+        self.requests = 0
+        self.wins = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def percentile(self, pct: float):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait on this provider before hedging to the next one"""
+        p95 = self.percentile(95) if len(self.latencies) >= HEDGE_MIN_SAMPLES else None
+        delay_ms = p95 * 1000 if p95 is not None else HEDGE_DELAY_MS
+        return max(delay_ms, HEDGE_MIN_DELAY_MS) / 1000
+
+    def to_dict(self) -> dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "requests": self.requests,
+            "wins": self.wins,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "hedge_delay_ms": round(self.hedge_delay() * 1000),
+        }
+
+
+# Module-level so stats survive across warm invocations
+provider_stats = {name: ProviderStats() for name, _, _ in PROVIDERS}
+
+# A hedged request can have every provider in flight at once
+http_pool.configure(concurrency=len(PROVIDERS))
+
+# One loop per warm instance so pooled connections survive between requests
+event_loop = asyncio.new_event_loop()
 
 
 SYSTEM_PROMPT = """You are a career preference extraction agent for Fractional.Quest.
@@ -54,32 +131,124 @@ Set requires_hard_validation=false for:
 
 Only extract EXPLICIT preferences. Set should_confirm=true if any hard validations exist."""
 
-# Create agent lazily to allow environment to be set
-extraction_agent = None
+# Create agents lazily to allow environment to be set
+extraction_agents = {}
 
-def get_agent():
-    global extraction_agent
-    if extraction_agent is None:
-        model = get_model()
+def get_agent(provider: str):
+    if provider not in extraction_agents:
+        model = MODELS[provider]
         print(f"[Pydantic AI] Using model: {model}")
-        extraction_agent = Agent(
-            model=model,
+        extraction_agents[provider] = http_pool.build_agent(
+            model,
             output_type=ExtractionResult,
             system_prompt=SYSTEM_PROMPT
         )
-    return extraction_agent
+    return extraction_agents[provider]
 
 
-async def do_extraction(transcript: str) -> dict:
+async def run_provider(provider: str, prompt: str) -> ExtractionResult:
+    """Run one provider and record its latency (a lower bound if cancelled) / outcome"""
+    stats = provider_stats[provider]
+    stats.requests += 1
+    started = time.perf_counter()
+    try:
+        result = await get_agent(provider).run(prompt)
+    except asyncio.CancelledError:
+        # Lost to a hedge: it took at least this long. Dropping the sample would
+        # censor the tail and drag p95 (and the hedge delay) down over time.
+        stats.cancelled += 1
+        stats.latencies.append(time.perf_counter() - started)
+        raise
+    except Exception:
+        stats.errors += 1
+        raise
+    stats.latencies.append(time.perf_counter() - started)
+    return result.output
+
+
+async def hedged_run(prompt: str, deadline: float) -> tuple[str, ExtractionResult]:
+    """
+    Run the provider chain with hedging, returning (provider, result) for the
+    first provider to succeed. Raises TimeoutError once the deadline passes.
+    """
+    providers = get_providers()
+    if not providers:
+        raise RuntimeError("No provider API key configured")
+
+    loop = asyncio.get_running_loop()
+    deadline_at = loop.time() + deadline
+    tasks = {}
+    errors = []
+    launched = 0
+
+    def launch():
+        nonlocal launched
+        provider = providers[launched]
+        launched += 1
+        tasks[asyncio.create_task(run_provider(provider, prompt))] = provider
+
+    launch()
+    try:
+        while tasks:
+            remaining = deadline_at - loop.time()
+            if remaining <= 0:
+                raise TimeoutError("deadline exceeded")
+
+            can_hedge = launched < len(providers)
+            timeout = min(remaining, provider_stats[providers[launched - 1]].hedge_delay()) if can_hedge else remaining
+
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # Slow provider: hedge to the next one, keep the first running
+                if can_hedge:
+                    launch()
+                continue
+
+            for task in done:
+                provider = tasks.pop(task)
+                if task.exception() is None:
+                    provider_stats[provider].wins += 1
+                    return provider, task.result()
+                errors.append(f"{provider}: {task.exception()}")
+
+            # Failed provider: fail over immediately
+            if launched < len(providers):
+                launch()
+
+        raise RuntimeError("; ".join(errors))
+
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def parse_deadline_ms(value) -> int:
+    """Requested deadline capped at DEADLINE_MS; missing, invalid or <= 0 means DEADLINE_MS"""
+    try:
+        deadline_ms = int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return DEADLINE_MS
+    if deadline_ms <= 0:
+        return DEADLINE_MS
+    return min(deadline_ms, DEADLINE_MS)
+
+
+async def do_extraction(transcript: str, deadline_ms=None) -> dict:
     """Run the extraction"""
     if not transcript.strip():
         return {"preferences": [], "should_confirm": False}
 
+    deadline_ms = parse_deadline_ms(deadline_ms)
+
     try:
-        agent = get_agent()
-        result = await agent.run(f"Extract preferences from:\n\n{transcript}")
+        provider, output = await hedged_run(
+            f"Extract preferences from:\n\n{transcript}", deadline_ms / 1000
+        )
         # Access output via .output (not .data)
-        return result.output.model_dump()
+        return {**output.model_dump(), "provider": provider}
     except Exception as e:
         print(f"[Pydantic AI] Error: {e}")
         return {"preferences": [], "should_confirm": False, "error": str(e)}
@@ -94,9 +263,10 @@ class handler(BaseHTTPRequestHandler):
         try:
             data = json.loads(body)
             transcript = data.get("transcript", "")
+            deadline_ms = data.get("deadline_ms")
 
             # Run async extraction
-            result = asyncio.run(do_extraction(transcript))
+            result = event_loop.run_until_complete(do_extraction(transcript, deadline_ms))
 
             # Send response
             self.send_response(200)
@@ -118,6 +288,7 @@ class handler(BaseHTTPRequestHandler):
 
         # Return diagnostic info
         model = get_model()
+        providers = get_providers()
         has_openai = bool(os.environ.get('OPENAI_API_KEY'))
         has_anthropic = bool(os.environ.get('ANTHROPIC_API_KEY'))
         has_google = bool(os.environ.get('GOOGLE_API_KEY'))
@@ -125,8 +296,15 @@ class handler(BaseHTTPRequestHandler):
         self.wfile.write(json.dumps({
             "status": "ok",
             "agent": "pydantic-ai",
-            "version": "v8-output-fix",
+            "version": "v10-pooled-http",
             "model": model,
+            "chain": [MODELS[p] for p in providers],
+            "deadline_ms": DEADLINE_MS,
+            "providers": {
+                name: {"model": MODELS[name], "configured": name in providers, **stats.to_dict()}
+                for name, stats in provider_stats.items()
+            },
+            "http": http_pool.stats(),
             "keys": {
                 "openai": has_openai,
                 "anthropic": has_anthropic,
@@ -0,0 +1,163 @@
+"""
+Batch extraction for offline transcript backfills.
+
+Runs many ExtractionRequests with bounded concurrency and a requests/second
+cap, yielding results as they complete so callers can stream them. A failed
+extraction is yielded as its exception, never as an empty response, so
+callers can report it for retry.
+"""
+import asyncio
+import contextlib
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
+
+from db import bulk_upsert_preferences, resolve_user_ids
+from models import ExtractionRequest, ExtractionResponse, ValidationType
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart (rate <= 0 disables it)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+async def run_batch(
+    requests: list[ExtractionRequest],
+    extract: Callable[[ExtractionRequest], Awaitable[ExtractionResponse]],
+    concurrency: int = 8,
+    rate: float = 0.0,
+    guard=None,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[tuple[int, Union[ExtractionResponse, Exception]]]:
+    """
+    Yield (index, response or exception) in completion order. Each extraction
+    holds one of the guard's batch slots when a LoadGuard is given, and fails
+    with TimeoutError if waiting for the slot plus the run exceeds `timeout`.
+    """
+    limiter = RateLimiter(rate)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def worker(index: int, request: ExtractionRequest):
+        async with semaphore:
+            await limiter.acquire()
+            async def guarded():
+                async with guard.slot() if guard is not None else contextlib.nullcontext():
+                    return await extract(request)
+
+            try:
+                return index, await asyncio.wait_for(guarded(), timeout)
+            except asyncio.TimeoutError as e:
+                if guard is not None:
+                    guard.timed_out += 1
+                return index, e
+            except Exception as e:
+                return index, e
+
+    tasks = [asyncio.create_task(worker(i, r)) for i, r in enumerate(requests)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def error_message(error: Exception) -> str:
+    return str(error) or type(error).__name__
+
+
+def preference_rows(user_ids: dict[str, int], request: ExtractionRequest, response: ExtractionResponse):
+    """Flatten one extraction into user_repo_preferences rows"""
+    internal_id = user_ids.get(request.user_id)
+    if internal_id is None:
+        return []
+
+    rows = []
+    for pref in response.preferences:
+        validation = ValidationType.HARD if pref.requires_hard_validation else ValidationType.SOFT
+        for value in pref.values:
+            rows.append((internal_id, pref.type.value, value, validation.value, pref.raw_text))
+    return rows
+
+
+async def save_batch(conn, items: list[tuple[ExtractionRequest, ExtractionResponse]]) -> dict:
+    """Bulk upsert extracted preferences for a chunk of batch results"""
+    user_ids = await resolve_user_ids(conn, (req.user_id for req, _ in items))
+
+    rows = []
+    for request, response in items:
+        rows.extend(preference_rows(user_ids, request, response))
+
+    saved = await bulk_upsert_preferences(conn, rows, keep_stronger=True) if rows else []
+    return {
+        "saved": len(saved),
+        "users": sorted({req.user_id for req, _ in items if req.user_id in user_ids}),
+        "unknown_users": sorted({
+            req.user_id for req, _ in items if req.user_id and req.user_id not in user_ids
+        }),
+    }
+
+
+# Results are upserted in chunks of this size while the batch streams
+SAVE_CHUNK = 200
+
+
+async def extract_and_save(
+    requests: list[ExtractionRequest],
+    extract: Callable[[ExtractionRequest], Awaitable[ExtractionResponse]],
+    summary: dict,
+    conn=None,
+    concurrency: int = 8,
+    rate: float = 0.0,
+    on_saved: Optional[Callable[[list[str]], None]] = None,
+    guard=None,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[tuple[int, Union[ExtractionResponse, Exception]]]:
+    """
+    run_batch plus chunked bulk upserts when a connection is given.
+    Progress is accumulated into `summary` (completed / failed / saved /
+    unknown_users); on_saved is called with the user_ids written by each chunk.
+    """
+    summary.setdefault("completed", 0)
+    summary.setdefault("failed", 0)
+    summary.setdefault("saved", 0)
+    unknown = set(summary.get("unknown_users", []))
+    pending = []
+
+    async def flush():
+        result = await save_batch(conn, pending)
+        summary["saved"] += result["saved"]
+        unknown.update(result["unknown_users"])
+        summary["unknown_users"] = sorted(unknown)
+        pending.clear()
+        if on_saved is not None:
+            on_saved(result["users"])
+
+    async for index, response in run_batch(requests, extract, concurrency, rate, guard, timeout):
+        if isinstance(response, Exception):
+            summary["failed"] += 1
+            yield index, response
+            continue
+        summary["completed"] += 1
+        item = requests[index]
+        if conn is not None and item.user_id and response.preferences:
+            pending.append((item, response))
+            if len(pending) >= SAVE_CHUNK:
+                await flush()
+        yield index, response
+
+    if pending:
+        await flush()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Batch preference extraction CLI
+
+Re-mines stored onboarding / Hume transcripts offline using the same agent
+and batch runner as POST /extract/batch.
+
+Input is JSONL, one ExtractionRequest per line:
+    {"transcript": "...", "user_id": "neon-auth-id", "context": ["..."]}
+
+Usage:
+    python batch_extract.py transcripts.jsonl --output results.jsonl --concurrency 8 --rate 5 --save
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from functools import partial
+
+from batch import error_message, extract_and_save
+from db import ensure_preferences_table
+from guard import REQUEST_DEADLINE_MS
+from main import run_extraction
+from models import ExtractionRequest
+
+
+def load_requests(path: str) -> list[ExtractionRequest]:
+    with open(path) as f:
+        return [
+            ExtractionRequest.model_validate_json(line)
+            for line in f
+            if line.strip()
+        ]
+
+
+async def main(args):
+    requests = load_requests(args.input)
+    print(f"Loaded {len(requests)} transcripts from {args.input}", file=sys.stderr)
+
+    conn = None
+    if args.save:
+        import asyncpg
+
+        database_url = os.environ.get("DATABASE_URL")
+        if not database_url:
+            raise ValueError("DATABASE_URL environment variable not set")
+        conn = await asyncpg.connect(database_url)
+        await ensure_preferences_table(conn)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    summary = {"total": len(requests)}
+    started = time.monotonic()
+
+    try:
+        async for index, response in extract_and_save(
+            requests, partial(run_extraction, raise_errors=True), summary, conn=conn,
+            concurrency=args.concurrency, rate=args.rate, timeout=args.timeout
+        ):
+            line = {"index": index, "user_id": requests[index].user_id}
+            if isinstance(response, Exception):
+                line["error"] = error_message(response)
+            else:
+                line["result"] = response.model_dump(mode="json")
+            out.write(json.dumps(line) + "\n")
+
+            done = summary["completed"] + summary["failed"]
+            if done % 50 == 0:
+                print(f"  {done}/{len(requests)} done ({summary['failed']} failed)", file=sys.stderr)
+
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if conn is not None:
+            await conn.close()
+
+    elapsed = time.monotonic() - started
+    print(f"COMPLETE: {summary['completed']} extracted, {summary['failed']} failed, {summary['saved']} preferences saved in {elapsed:.1f}s", file=sys.stderr)
+    if summary["failed"]:
+        print(f"  Failed transcripts have an \"error\" field in the output; re-run those lines", file=sys.stderr)
+    if summary.get("unknown_users"):
+        print(f"  Skipped {len(summary['unknown_users'])} unknown users", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-extract preferences from stored transcripts")
+    parser.add_argument("input", help="JSONL file of ExtractionRequests")
+    parser.add_argument("--output", type=str, help="Write JSONL results here (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Max extractions in flight")
+    parser.add_argument("--rate", type=float, default=0.0, help="Max extractions started per second (0 = unlimited)")
+    parser.add_argument("--timeout", type=float, default=REQUEST_DEADLINE_MS / 1000, help="Seconds before one extraction is failed")
+    parser.add_argument("--save", action="store_true", help="Bulk upsert results into user_repo_preferences")
+
+    asyncio.run(main(parser.parse_args()))
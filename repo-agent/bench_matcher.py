@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+JobMatcher benchmark on synthetic classified jobs (no database needed).
+
+Usage:
+    python bench_matcher.py --jobs 100000 --queries 200
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from matcher import ROLE_CATEGORY_KEYWORDS, JobMatcher
+from models import PreferenceGroup, PreferenceType, UserProfile
+
+SENIORITIES = ["Executive", "Director", "Manager", "Senior", "Mid", "Junior", "Intern"]
+CITIES = ["London", "Manchester", "Birmingham", "Leeds", "Bristol", "Edinburgh", "Glasgow",
+          "Cardiff", "Belfast", "Cambridge", "Oxford", "Newcastle", "Liverpool", "Remote"]
+
+
+def synthetic_jobs(n: int, n_skills: int, rng: random.Random, offset: int = 0) -> list[dict]:
+    skills = [f"skill {i}" for i in range(n_skills)]
+    # Zipf-ish: a few skills are very common, most are rare
+    weights = [1 / (i + 1) for i in range(n_skills)]
+    categories = list(ROLE_CATEGORY_KEYWORDS)
+    jobs = []
+    for i in range(n):
+        rate = rng.choice([None, rng.randint(300, 1500), rng.randint(40000, 180000)])
+        city = rng.choice(CITIES)
+        jobs.append({
+            "id": f"job-{offset + i}",
+            "title": f"Job {offset + i}",
+            "role_category": rng.choice(categories),
+            "seniority_level": rng.choice(SENIORITIES),
+            "location": f"{city}, UK",
+            "is_remote": city == "Remote" or rng.random() < 0.2,
+            "salary_min": int(rate * 0.8) if rate else None,
+            "salary_max": rate,
+            "skills_required": rng.choices(skills, weights=weights, k=rng.randint(8, 15)),
+        })
+    return jobs
+
+
+def random_profile(n_skills: int, rng: random.Random) -> UserProfile:
+    return UserProfile(user_id="bench", preferences={
+        PreferenceType.SKILL: PreferenceGroup(
+            validated=[f"skill {rng.randrange(n_skills)}" for _ in range(5)],
+            soft=[f"skill {rng.randrange(200)}" for _ in range(5)],
+        ),
+        PreferenceType.ROLE: PreferenceGroup(hard=[rng.choice(["CFO", "CMO", "CTO", "COO"])]),
+        PreferenceType.LOCATION: PreferenceGroup(soft=[rng.choice(CITIES)]),
+        PreferenceType.DAY_RATE: PreferenceGroup(validated=[f"£{rng.randint(500, 1000)}"]),
+    })
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    jobs = synthetic_jobs(args.jobs, args.skills, rng)
+
+    matcher = JobMatcher()
+    _, build_ms = timed(matcher.upsert_jobs, jobs)
+    print(f"Build: {args.jobs} jobs, {len(matcher.skills)} skills, "
+          f"{len(matcher.skill_rows)} skill entries in {build_ms:.0f}ms")
+
+    profiles = [random_profile(args.skills, rng) for _ in range(args.queries)]
+    latencies = np.array([timed(matcher.top, p, 20)[1] for p in profiles])
+    print(f"Score + top-20 over {len(matcher)} jobs: "
+          f"p50 {np.percentile(latencies, 50):.2f}ms, p99 {np.percentile(latencies, 99):.2f}ms")
+
+    # Incremental refresh: half re-classified existing jobs, half new ones
+    updated = synthetic_jobs(args.refresh // 2, args.skills, rng)
+    new = synthetic_jobs(args.refresh - len(updated), args.skills, rng, offset=args.jobs)
+    _, refresh_ms = timed(matcher.upsert_jobs, updated + new)
+    print(f"Incremental upsert of {args.refresh} jobs: {refresh_ms:.1f}ms "
+          f"({len(matcher.job_ids) - len(matcher)} tombstoned rows)")
+
+    _, compact_ms = timed(matcher.compact)
+    print(f"Compact: {compact_ms:.1f}ms")
+
+    latencies = np.array([timed(matcher.top, p, 20)[1] for p in profiles])
+    print(f"Score + top-20 after compact: "
+          f"p50 {np.percentile(latencies, 50):.2f}ms, p99 {np.percentile(latencies, 99):.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized job matcher")
+    parser.add_argument("--jobs", type=int, default=100_000, help="Number of synthetic jobs")
+    parser.add_argument("--skills", type=int, default=3000, help="Skill vocabulary size")
+    parser.add_argument("--queries", type=int, default=200, help="Profiles to score")
+    parser.add_argument("--refresh", type=int, default=1000, help="Jobs in the incremental upsert")
+    parser.add_argument("--seed", type=int, default=42)
+
+    main(parser.parse_args())
@@ -0,0 +1,122 @@
+"""
+Neon helpers shared by the repo-agent endpoints and CLIs.
+"""
+import os
+from typing import Iterable, Optional
+
+_pool = None
+_preferences_table_ready = False
+
+CREATE_PREFERENCES_TABLE = """
+    CREATE TABLE IF NOT EXISTS user_repo_preferences (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        preference_type VARCHAR(50) NOT NULL,
+        preference_value TEXT NOT NULL,
+        validation_type VARCHAR(20) DEFAULT 'soft',
+        raw_text TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, preference_type, preference_value)
+    )
+"""
+
+
+async def get_pool():
+    """Process-wide asyncpg pool, created on first use"""
+    global _pool
+    if _pool is None:
+        import asyncpg
+
+        database_url = os.environ.get("DATABASE_URL")
+        if not database_url:
+            raise RuntimeError("Database not configured")
+        _pool = await asyncpg.create_pool(
+            database_url,
+            min_size=1,
+            max_size=int(os.environ.get("DB_POOL_SIZE", "5")),
+        )
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def ensure_preferences_table(conn):
+    """Run CREATE_PREFERENCES_TABLE once per process"""
+    global _preferences_table_ready
+    if not _preferences_table_ready:
+        await conn.execute(CREATE_PREFERENCES_TABLE)
+        _preferences_table_ready = True
+
+
+# Stronger validation wins when the same value is saved twice in one batch
+VALIDATION_RANK = {"soft": 0, "hard": 1, "validated": 2}
+
+
+async def resolve_user_ids(conn, auth_ids: Iterable[str]) -> dict[str, int]:
+    """Map neon_auth_id -> users.id in a single round trip"""
+    auth_ids = list({a for a in auth_ids if a})
+    if not auth_ids:
+        return {}
+
+    rows = await conn.fetch(
+        "SELECT id, neon_auth_id FROM users WHERE neon_auth_id = ANY($1::text[])",
+        auth_ids
+    )
+    return {row["neon_auth_id"]: row["id"] for row in rows}
+
+
+async def bulk_upsert_preferences(
+    conn,
+    rows: Iterable[tuple[int, str, str, str, Optional[str]]],
+    keep_stronger: bool = False,
+) -> list[dict]:
+    """
+    Upsert many (user_id, preference_type, preference_value, validation_type, raw_text)
+    rows with one INSERT ... SELECT FROM unnest(...).
+
+    Duplicate keys are collapsed first because ON CONFLICT DO UPDATE cannot
+    touch the same row twice in one statement: the last row's validation_type
+    wins (and the first row's raw_text), matching one-at-a-time upserts. With
+    keep_stronger the strongest validation wins instead, and an existing
+    hard/validated row is never downgraded (used by backfills, not /validate).
+    """
+    deduped: dict[tuple[int, str, str], tuple] = {}
+    for row in rows:
+        key = (row[0], row[1], row[2])
+        existing = deduped.get(key)
+        if existing is None:
+            deduped[key] = row
+        elif not keep_stronger:
+            deduped[key] = (*existing[:3], row[3], existing[4])
+        elif VALIDATION_RANK.get(row[3], 0) >= VALIDATION_RANK.get(existing[3], 0):
+            deduped[key] = row
+
+    if not deduped:
+        return []
+
+    user_ids, types, values, validations, raw_texts = map(list, zip(*deduped.values()))
+
+    update = "EXCLUDED.validation_type"
+    if keep_stronger:
+        update = """
+            CASE WHEN user_repo_preferences.validation_type = 'validated'
+                   OR (user_repo_preferences.validation_type = 'hard' AND EXCLUDED.validation_type = 'soft')
+                 THEN user_repo_preferences.validation_type
+                 ELSE EXCLUDED.validation_type END
+        """
+
+    result = await conn.fetch(f"""
+        INSERT INTO user_repo_preferences
+        (user_id, preference_type, preference_value, validation_type, raw_text)
+        SELECT * FROM unnest($1::int[], $2::text[], $3::text[], $4::text[], $5::text[])
+        ON CONFLICT (user_id, preference_type, preference_value)
+        DO UPDATE SET validation_type = {update}
+        RETURNING id, user_id, preference_type, preference_value, validation_type
+    """, user_ids, types, values, validations, raw_texts)
+
+    return [dict(r) for r in result]
@@ -0,0 +1,132 @@
+"""
+Request guard for LLM-backed endpoints.
+
+- Deadline: X-Request-Deadline-Ms header (capped) or REQUEST_DEADLINE_MS
+- Cancellation: the agent run is cancelled if the client disconnects
+- Load shedding: beyond MAX_IN_FLIGHT concurrent runs, reply 503 + Retry-After
+
+Batch extraction has its own, smaller budget: LoadGuard.slot() waits for one
+of BATCH_MAX_IN_FLIGHT slots rather than shedding, and never takes /extract
+slots, so a backfill queues instead of failing and can't shed live traffic.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Coroutine
+
+from fastapi import HTTPException, Request
+
+DEADLINE_HEADER = "x-request-deadline-ms"
+
+REQUEST_DEADLINE_MS = int(os.environ.get("REQUEST_DEADLINE_MS", "20000"))
+MAX_REQUEST_DEADLINE_MS = int(os.environ.get("MAX_REQUEST_DEADLINE_MS", "60000"))
+MAX_IN_FLIGHT = int(os.environ.get("MAX_IN_FLIGHT", "32"))
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", "2"))
+# Agent runs shared by all in-progress batches, on top of MAX_IN_FLIGHT
+BATCH_MAX_IN_FLIGHT = int(os.environ.get("BATCH_MAX_IN_FLIGHT", str(max(1, MAX_IN_FLIGHT // 4))))
+
+# How often to check whether the client has gone away
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class LoadGuard:
+    def __init__(
+        self,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        default_deadline_ms: int = REQUEST_DEADLINE_MS,
+        max_deadline_ms: int = MAX_REQUEST_DEADLINE_MS,
+        retry_after: int = RETRY_AFTER_SECONDS,
+        batch_max_in_flight: int = BATCH_MAX_IN_FLIGHT,
+    ):
+        self.max_in_flight = max_in_flight
+        self.batch_max_in_flight = batch_max_in_flight
+        self.default_deadline_ms = default_deadline_ms
+        self.max_deadline_ms = max_deadline_ms
+        self.retry_after = retry_after
+
+        self.in_flight = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+        self._batch_slots = asyncio.Semaphore(batch_max_in_flight)
+        self.batch_in_flight = 0
+        self.batch_waiting = 0
+
+    def deadline_for(self, request: Request) -> float:
+        """Deadline in seconds for this request"""
+        try:
+            deadline_ms = int(request.headers.get(DEADLINE_HEADER, self.default_deadline_ms))
+        except ValueError:
+            deadline_ms = self.default_deadline_ms
+        return max(1, min(deadline_ms, self.max_deadline_ms)) / 1000
+
+    def _shed(self) -> HTTPException:
+        self.shed += 1
+        return HTTPException(
+            status_code=503,
+            detail="Too many requests in flight",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one batch slot, waiting until one is free (bound the wait with a timeout)"""
+        self.batch_waiting += 1
+        try:
+            await self._batch_slots.acquire()
+        finally:
+            self.batch_waiting -= 1
+        self.batch_in_flight += 1
+        try:
+            yield
+        finally:
+            self.batch_in_flight -= 1
+            self._batch_slots.release()
+
+    async def run(self, request: Request, coro: Coroutine[Any, Any, Any]):
+        """Await `coro` under the deadline, disconnect and in-flight limits"""
+        if self.in_flight >= self.max_in_flight:
+            coro.close()
+            raise self._shed()
+
+        deadline = self.deadline_for(request)
+        self.in_flight += 1
+        work = asyncio.create_task(coro)
+        watcher = asyncio.create_task(self._wait_for_disconnect(request))
+
+        try:
+            done, _ = await asyncio.wait(
+                {work, watcher}, timeout=deadline, return_when=asyncio.FIRST_COMPLETED
+            )
+            if work in done:
+                return work.result()
+            if watcher in done:
+                self.cancelled += 1
+                # Nobody is listening; 499 is what nginx logs for this
+                raise HTTPException(status_code=499, detail="Client disconnected")
+            self.timed_out += 1
+            raise HTTPException(status_code=504, detail="Deadline exceeded")
+
+        finally:
+            self.in_flight -= 1
+            for task in (work, watcher):
+                task.cancel()
+            await asyncio.gather(work, watcher, return_exceptions=True)
+
+    @staticmethod
+    async def _wait_for_disconnect(request: Request):
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+            "batch_in_flight": self.batch_in_flight,
+            "batch_max_in_flight": self.batch_max_in_flight,
+            "batch_waiting": self.batch_waiting,
+        }
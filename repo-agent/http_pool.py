@@ -0,0 +1,161 @@
+"""
+Shared pooled HTTP transport for LLM providers and internal APIs.
+
+Every client in the process sits on one httpx.AsyncHTTPTransport, so LLM and
+ZEP traffic reuses warm connections. Pool limits are sized from the
+configured concurrency, HTTP/2 is used when `h2` is installed, and per-host
+connection reuse / latency stats are recorded via event hooks.
+
+Providers get their own thin AsyncClient on the shared transport because
+some of them (Gemini) set base_url and API-key headers on the client they
+are given.
+
+This is the only copy: scripts/ import it from repo-agent/ via sys.path, and
+the Vercel function bundles it with includeFiles (vercel.json).
+"""
+import os
+import time
+from collections import deque
+from typing import Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = os.environ.get("HTTP_POOL_HTTP2", "true").lower() == "true"
+except ImportError:
+    HTTP2 = False
+
+KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_POOL_KEEPALIVE_EXPIRY", "60"))
+# LLM calls can legitimately take minutes; connects should not
+TIMEOUT = httpx.Timeout(float(os.environ.get("HTTP_POOL_TIMEOUT", "600")), connect=10.0)
+
+_concurrency = int(os.environ.get("HTTP_POOL_CONCURRENCY", "8"))
+_transport: Optional[httpx.AsyncHTTPTransport] = None
+_default_client: Optional[httpx.AsyncClient] = None
+_hosts: dict[str, "HostStats"] = {}
+
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.responses = 0
+        self.connections_opened = 0
+        self.latencies = deque(maxlen=500)
+
+    def to_dict(self) -> dict:
+        ordered = sorted(self.latencies)
+
+        def pct(p):
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000)
+
+        return {
+            "requests": self.requests,
+            "responses": self.responses,
+            "connections_opened": self.connections_opened,
+            "reused": max(0, self.requests - self.connections_opened),
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+        }
+
+
+def configure(concurrency: int):
+    """Size the pool for this many concurrent outbound calls (call before first use)"""
+    global _concurrency
+    _concurrency = max(1, concurrency)
+
+
+def limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=_concurrency * 2 + 4,
+        max_keepalive_connections=_concurrency + 4,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def get_transport() -> httpx.AsyncHTTPTransport:
+    global _transport
+    if _transport is None:
+        _transport = httpx.AsyncHTTPTransport(limits=limits(), http2=HTTP2)
+    return _transport
+
+
+async def _on_request(request: httpx.Request):
+    host = request.url.host
+    stats = _hosts.setdefault(host, HostStats())
+    stats.requests += 1
+
+    async def trace(event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            stats.connections_opened += 1
+
+    request.extensions["trace"] = trace
+    request.extensions["http_pool_started"] = time.perf_counter()
+
+
+async def _on_response(response: httpx.Response):
+    started = response.request.extensions.get("http_pool_started")
+    stats = _hosts.setdefault(response.request.url.host, HostStats())
+    stats.responses += 1
+    if started is not None:
+        stats.latencies.append(time.perf_counter() - started)
+
+
+def new_client(**kwargs) -> httpx.AsyncClient:
+    """A client on the shared transport; never close it, the transport is shared"""
+    return httpx.AsyncClient(
+        transport=get_transport(),
+        timeout=kwargs.pop("timeout", TIMEOUT),
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+        **kwargs,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide default client (ZEP, revalidation, OpenAI, Anthropic)"""
+    global _default_client
+    if _default_client is None:
+        _default_client = new_client()
+    return _default_client
+
+
+def build_model(model: str):
+    """pydantic_ai model for "provider:name" wired to the shared transport"""
+    provider, _, name = model.partition(":")
+
+    if provider == "openai":
+        from pydantic_ai.models.openai import OpenAIModel
+        from pydantic_ai.providers.openai import OpenAIProvider
+        return OpenAIModel(name, provider=OpenAIProvider(http_client=get_http_client()))
+
+    if provider == "anthropic":
+        from pydantic_ai.models.anthropic import AnthropicModel
+        from pydantic_ai.providers.anthropic import AnthropicProvider
+        return AnthropicModel(name, provider=AnthropicProvider(http_client=get_http_client()))
+
+    if provider == "google-gla":
+        from pydantic_ai.models.gemini import GeminiModel
+        from pydantic_ai.providers.google_gla import GoogleGLAProvider
+        api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+        # Gemini sets base_url + X-Goog-Api-Key on its client: give it its own
+        return GeminiModel(name, provider=GoogleGLAProvider(api_key=api_key, http_client=new_client()))
+
+    return model
+
+
+def build_agent(model: str, **kwargs):
+    from pydantic_ai import Agent
+    return Agent(build_model(model), **kwargs)
+
+
+def stats() -> dict:
+    pool = limits()
+    return {
+        "http2": HTTP2,
+        "max_connections": pool.max_connections,
+        "max_keepalive_connections": pool.max_keepalive_connections,
+        "hosts": {host: s.to_dict() for host, s in _hosts.items()},
+    }
+
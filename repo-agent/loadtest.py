@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Load test for repo-agent without Gemini or Neon.
+
+/extract runs against a FunctionModel stub with configurable latency, and
+/validate writes to a local Postgres (LOADTEST_DATABASE_URL, a scratch
+database - a minimal users table is created and seeded). Requests go through
+httpx.ASGITransport in-process, or to real uvicorn workers with --workers.
+
+Each endpoint is driven at increasing concurrency levels and reported as
+throughput, p50/p99 latency and 503 (shed) / error counts. Results can be
+saved as a baseline and later runs compared against it.
+
+Usage:
+    python loadtest.py --levels 1,8,32,64 --requests 400
+    python loadtest.py --save-baseline loadtest_baseline.json
+    python loadtest.py --compare loadtest_baseline.json --tolerance 0.2
+    LOADTEST_DATABASE_URL=postgresql://localhost/loadtest python loadtest.py --workers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Optional
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Stub model latency, read by create_stub_app() in uvicorn workers too
+MODEL_LATENCY_MS = float(os.environ.get("LOADTEST_MODEL_LATENCY_MS", "300"))
+MODEL_JITTER_MS = float(os.environ.get("LOADTEST_MODEL_JITTER_MS", "100"))
+
+LOADTEST_USERS = 200
+USER_PREFIX = "loadtest-user-"
+
+TRANSCRIPT = (
+    "I'm a CFO with fifteen years in SaaS. I only want fractional roles, two or three "
+    "days a week, and it has to be London or remote. Nothing below £900 a day."
+)
+
+STUB_PREFERENCES = [
+    {"type": "role", "values": ["CFO"], "confidence": 0.95,
+     "raw_text": "I'm a CFO", "requires_hard_validation": True},
+    {"type": "location", "values": ["London", "Remote"], "confidence": 0.9,
+     "raw_text": "it has to be London or remote", "requires_hard_validation": True},
+    {"type": "day_rate", "values": ["£900"], "confidence": 0.85,
+     "raw_text": "Nothing below £900 a day", "requires_hard_validation": True},
+    {"type": "availability", "values": ["2-3 days"], "confidence": 0.7,
+     "raw_text": "two or three days a week", "requires_hard_validation": False},
+]
+
+VALIDATE_VALUES = {
+    "role": ["CFO", "Finance Director", "COO"],
+    "industry": ["SaaS", "Fintech", "Healthcare"],
+    "location": ["London", "Remote", "Manchester"],
+    "skill": ["FP&A", "M&A", "Fundraising", "Board Reporting"],
+}
+
+
+def stub_model(latency_ms: float = MODEL_LATENCY_MS, jitter_ms: float = MODEL_JITTER_MS):
+    """FunctionModel that sleeps like Gemini and returns STUB_PREFERENCES"""
+    from pydantic_ai.messages import ModelResponse, ToolCallPart
+    from pydantic_ai.models.function import FunctionModel
+
+    async def respond(messages, info):
+        delay = max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        return ModelResponse(parts=[
+            ToolCallPart(tool_name=info.output_tools[0].name, args={"response": STUB_PREFERENCES})
+        ])
+
+    return FunctionModel(respond)
+
+
+def load_app(latency_ms: float = MODEL_LATENCY_MS, jitter_ms: float = MODEL_JITTER_MS):
+    """Import main with the stub model in place of Gemini"""
+    # build_agent() needs a key to construct the Gemini provider; it's never used
+    os.environ.setdefault("GEMINI_API_KEY", "loadtest")
+    if os.environ.get("LOADTEST_DATABASE_URL"):
+        os.environ["DATABASE_URL"] = os.environ["LOADTEST_DATABASE_URL"]
+
+    import main
+
+    main.extraction_agent.model = stub_model(latency_ms, jitter_ms)
+    return main
+
+
+async def check_stub(main):
+    """run_extraction swallows errors as an empty 200, so make sure the stub really validates"""
+    from models import ExtractionRequest
+
+    result = await main.extraction_agent.run(TRANSCRIPT)
+    response = await main.run_extraction(ExtractionRequest(transcript=TRANSCRIPT))
+    if len(result.output) != len(STUB_PREFERENCES) or not response.preferences:
+        raise RuntimeError("Stub model output did not validate as list[ExtractedPreference]")
+
+
+def create_stub_app():
+    """uvicorn factory: `uvicorn loadtest:create_stub_app --factory`"""
+    return load_app().app
+
+
+async def seed_database(database_url: str):
+    """Create and seed loadtest users; clear their preferences so runs are comparable"""
+    import asyncpg
+
+    from db import CREATE_PREFERENCES_TABLE
+
+    conn = await asyncpg.connect(database_url)
+    try:
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id SERIAL PRIMARY KEY,
+                neon_auth_id TEXT UNIQUE
+            )
+        """)
+        await conn.execute(CREATE_PREFERENCES_TABLE)
+        await conn.execute("""
+            INSERT INTO users (neon_auth_id)
+            SELECT a FROM unnest($1::text[]) AS a
+            WHERE NOT EXISTS (SELECT 1 FROM users WHERE neon_auth_id = a)
+        """, [f"{USER_PREFIX}{i}" for i in range(LOADTEST_USERS)])
+        await conn.execute("""
+            DELETE FROM user_repo_preferences
+            WHERE user_id IN (SELECT id FROM users WHERE neon_auth_id LIKE $1)
+        """, f"{USER_PREFIX}%")
+    finally:
+        await conn.close()
+
+
+def extract_payload(i: int) -> dict:
+    return {"transcript": TRANSCRIPT, "user_id": f"{USER_PREFIX}{i % LOADTEST_USERS}"}
+
+
+def validate_payload(i: int) -> dict:
+    pref_type = list(VALIDATE_VALUES)[i % len(VALIDATE_VALUES)]
+    values = VALIDATE_VALUES[pref_type]
+    return {
+        "user_id": f"{USER_PREFIX}{i % LOADTEST_USERS}",
+        "preference_type": pref_type,
+        "values": [values[i % len(values)]],
+        "validation_type": random.choice(["soft", "hard", "validated"]),
+        "raw_text": TRANSCRIPT,
+    }
+
+
+ENDPOINTS = {
+    "extract": ("/extract", extract_payload),
+    "validate": ("/validate", validate_payload),
+}
+
+
+def percentile(ordered: list[float], p: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, concurrency: int, total: int) -> dict:
+    """Send `total` requests to `endpoint` from `concurrency` workers"""
+    path, payload = ENDPOINTS[endpoint]
+    latencies, statuses = [], {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            i = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload(i))
+                status = response.status_code
+            except httpx.HTTPError:
+                status = "error"
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "ok": statuses.get(200, 0),
+        "shed": statuses.get(503, 0),
+        "errors": total - statuses.get(200, 0) - statuses.get(503, 0),
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        "throughput": round(statuses.get(200, 0) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 1) if latencies else None,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_uvicorn(workers: int, args) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = dict(
+        os.environ,
+        LOADTEST_MODEL_LATENCY_MS=str(args.latency_ms),
+        LOADTEST_MODEL_JITTER_MS=str(args.jitter_ms),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "loadtest:create_stub_app", "--factory",
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=HERE, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient() as client:
+        for _ in range(300):
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return proc, base_url
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not become healthy within 30s")
+
+
+async def run(args) -> dict:
+    endpoints = args.endpoints.split(",")
+    levels = [int(level) for level in args.levels.split(",")]
+
+    database_url = os.environ.get("LOADTEST_DATABASE_URL")
+    if "validate" in endpoints:
+        if database_url:
+            await seed_database(database_url)
+        else:
+            print("LOADTEST_DATABASE_URL not set, skipping /validate")
+            endpoints.remove("validate")
+
+    if args.write_behind:
+        os.environ["VALIDATE_WRITE_BEHIND"] = "true"
+
+    proc = None
+    if args.workers:
+        proc, base_url = await start_uvicorn(args.workers, args)
+        transport = None
+        mode = f"uvicorn x{args.workers}"
+    else:
+        main = load_app(args.latency_ms, args.jitter_ms)
+        await check_stub(main)
+        base_url = "http://loadtest"
+        transport = httpx.ASGITransport(app=main.app)
+        mode = "asgi"
+
+    print(f"\n{'='*72}")
+    print(f"repo-agent load test ({mode}, model {args.latency_ms:.0f}±{args.jitter_ms:.0f}ms, "
+          f"{args.requests} requests/level)")
+    print(f"{'='*72}")
+    print(f"{'endpoint':<10}{'conc':>6}{'ok':>7}{'shed':>7}{'err':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+
+    results = {}
+    try:
+        limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+        async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits,
+                                     timeout=120.0) as client:
+            for endpoint in endpoints:
+                results[endpoint] = {}
+                for concurrency in levels:
+                    level = await run_level(client, endpoint, concurrency, args.requests)
+                    results[endpoint][str(concurrency)] = level
+                    print(f"{endpoint:<10}{concurrency:>6}{level['ok']:>7}{level['shed']:>7}"
+                          f"{level['errors']:>6}{level['throughput']:>10}"
+                          f"{level['p50_ms'] if level['p50_ms'] is not None else '-':>10}"
+                          f"{level['p99_ms'] if level['p99_ms'] is not None else '-':>10}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        elif "main" in sys.modules:
+            await sys.modules["main"].shutdown()
+
+    return {
+        "config": {
+            "mode": mode,
+            "requests": args.requests,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "write_behind": args.write_behind,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions beyond `tolerance` (fractional) in throughput or p99"""
+    if current["config"] != baseline["config"]:
+        print(f"Warning: baseline config differs: {baseline['config']}")
+
+    regressions = []
+    for endpoint, levels in current["results"].items():
+        for concurrency, now in levels.items():
+            before = baseline["results"].get(endpoint, {}).get(concurrency)
+            if before is None:
+                continue
+            if before["throughput"] and now["throughput"] < before["throughput"] * (1 - tolerance):
+                regressions.append(
+                    f"{endpoint} @{concurrency}: throughput {now['throughput']} < {before['throughput']} req/s"
+                )
+            if before["p99_ms"] and now["p99_ms"] and now["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{endpoint} @{concurrency}: p99 {now['p99_ms']}ms > {before['p99_ms']}ms"
+                )
+            if now["errors"] > before["errors"]:
+                regressions.append(f"{endpoint} @{concurrency}: {now['errors']} errors (was {before['errors']})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test repo-agent with a stub model")
+    parser.add_argument("--endpoints", default="extract,validate", help="Comma-separated: extract,validate")
+    parser.add_argument("--levels", default="1,8,32,64", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per endpoint per level")
+    parser.add_argument("--latency-ms", type=float, default=MODEL_LATENCY_MS, help="Stub model latency")
+    parser.add_argument("--jitter-ms", type=float, default=MODEL_JITTER_MS, help="Stub model latency jitter")
+    parser.add_argument("--workers", type=int, default=0, help="Run under uvicorn with N workers (0 = in-process)")
+    parser.add_argument("--write-behind", action="store_true", help="Enable VALIDATE_WRITE_BEHIND")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs {args.compare}:")
+            for line in regressions:
+                print(f"  ✗ {line}")
+            sys.exit(1)
+        print(f"\nNo regressions vs {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
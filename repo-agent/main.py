@@ -6,25 +6,40 @@ Deploy on Railway:
 2. Set environment variables: GOOGLE_API_KEY, DATABASE_URL
 3. Railway auto-detects Python and runs uvicorn
 """
+import asyncio
+import json
 import os
+import time
 import uuid
 from datetime import datetime, timedelta
+from functools import partial
 from typing import Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic_ai import Agent
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 
+import http_pool
+
+from batch import error_message, extract_and_save
+from db import close_pool, ensure_preferences_table, get_pool
+from guard import BATCH_MAX_IN_FLIGHT, MAX_IN_FLIGHT, LoadGuard
+from matcher import JobMatcher
 from models import (
+    BatchExtractionRequest,
     ExtractedPreference,
     ExtractionRequest,
     ExtractionResponse,
+    PreferenceGroup,
     PreferenceType,
     SavePreferenceRequest,
+    UserProfile,
     ValidationRequest,
     ValidationType,
 )
+from profile_cache import ProfileCache
+from write_behind import PreferenceWriteQueue
 
 load_dotenv()
 
@@ -46,10 +61,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Deadlines, disconnect cancellation and load shedding for /extract
+guard = LoadGuard()
+
+# Optional group-commit mode for /validate (VALIDATE_WRITE_BEHIND=true)
+write_queue = (
+    PreferenceWriteQueue()
+    if os.environ.get("VALIDATE_WRITE_BEHIND", "false").lower() == "true"
+    else None
+)
+
+# Consolidated per-user profiles for GET /profile, invalidated by writes
+profile_cache = ProfileCache()
+
+# Classified jobs in NumPy arrays for GET /matches, refreshed incrementally
+job_matcher = JobMatcher()
+matcher_lock = asyncio.Lock()
+matcher_refreshed_at = 0.0
+MATCHER_REFRESH_SECONDS = int(os.environ.get("MATCHER_REFRESH_SECONDS", "60"))
+
+# Outbound pool sized for the most agent runs /extract and batches let through at once
+http_pool.configure(concurrency=MAX_IN_FLIGHT + BATCH_MAX_IN_FLIGHT)
+
 # Pydantic AI Agent using Google Gemini
-extraction_agent = Agent(
-    model="google-gla:gemini-2.0-flash",
-    result_type=list[ExtractedPreference],
+extraction_agent = http_pool.build_agent(
+    "google-gla:gemini-2.0-flash",
+    output_type=list[ExtractedPreference],
     system_prompt="""
 You are a career preference extraction agent for Fractional.Quest, a platform for fractional executive roles in the UK.
 
@@ -102,9 +139,11 @@ def create_validation_request(pref: ExtractedPreference) -> ValidationRequest:
     )
 
 
-@app.post("/extract", response_model=ExtractionResponse)
-async def extract_preferences(request: ExtractionRequest):
-    """Extract career preferences using Pydantic AI + Gemini"""
+async def run_extraction(request: ExtractionRequest, raise_errors: bool = False) -> ExtractionResponse:
+    """
+    Run the extraction agent for one transcript. Errors yield an empty
+    response unless raise_errors is set (batch callers report them instead).
+    """
     if not request.transcript or not request.transcript.strip():
         return ExtractionResponse(
             preferences=[],
@@ -121,7 +160,7 @@ async def extract_preferences(request: ExtractionRequest):
             f"Extract preferences from:\n\n{request.transcript}{context_str}"
         )
 
-        preferences = result.data
+        preferences = result.output
         validation_requests = [create_validation_request(p) for p in preferences]
         should_confirm = any(v.validation_type == ValidationType.HARD for v in validation_requests)
 
@@ -133,6 +172,8 @@ async def extract_preferences(request: ExtractionRequest):
 
     except Exception as e:
         print(f"[Repo Agent] Error: {e}")
+        if raise_errors:
+            raise
         return ExtractionResponse(
             preferences=[],
             validation_requests=[],
@@ -140,6 +181,63 @@ async def extract_preferences(request: ExtractionRequest):
         )
 
 
+@app.post("/extract", response_model=ExtractionResponse)
+async def extract_preferences(request: ExtractionRequest, http_request: Request):
+    """Extract career preferences using Pydantic AI + Gemini"""
+    return await guard.run(http_request, run_extraction(request))
+
+
+@app.post("/extract/batch")
+async def extract_batch(request: BatchExtractionRequest):
+    """
+    Extract preferences from many transcripts.
+
+    Streams one NDJSON line per transcript as it completes ("result", or
+    "error" if the extraction failed and should be retried), followed by a
+    summary line. With save=true, results are bulk-upserted into
+    user_repo_preferences as they arrive.
+    """
+    database_url = os.environ.get("DATABASE_URL")
+    if request.save and not database_url:
+        raise HTTPException(status_code=500, detail="Database not configured")
+
+    async def stream():
+        import asyncpg
+
+        conn = None
+        summary = {"total": len(request.requests)}
+
+        try:
+            if request.save:
+                conn = await asyncpg.connect(database_url)
+                await ensure_preferences_table(conn)
+
+            async for index, response in extract_and_save(
+                request.requests, partial(run_extraction, raise_errors=True), summary, conn=conn,
+                concurrency=request.concurrency, rate=request.rate_per_second,
+                on_saved=profile_cache.invalidate_many,
+                guard=guard, timeout=guard.default_deadline_ms / 1000
+            ):
+                line = {"index": index, "user_id": request.requests[index].user_id}
+                if isinstance(response, Exception):
+                    line["error"] = error_message(response)
+                else:
+                    line["result"] = response.model_dump(mode="json")
+                yield json.dumps(line) + "\n"
+
+        except Exception as e:
+            print(f"[Repo Agent] Batch error: {e}")
+            summary["error"] = str(e)
+
+        finally:
+            if conn is not None:
+                await conn.close()
+
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @app.post("/validate")
 async def validate_preference(request: SavePreferenceRequest):
     """Save validated preference to Neon"""
@@ -149,6 +247,11 @@ async def validate_preference(request: SavePreferenceRequest):
     if not database_url:
         raise HTTPException(status_code=500, detail="Database not configured")
 
+    if write_queue is not None:
+        saved = await write_queue.submit(request)
+        profile_cache.invalidate(request.user_id)
+        return {"success": True, "saved": saved}
+
     try:
         conn = await asyncpg.connect(database_url)
 
@@ -163,18 +266,7 @@ async def validate_preference(request: SavePreferenceRequest):
 
         internal_user_id = user_row["id"]
 
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS user_repo_preferences (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                preference_type VARCHAR(50) NOT NULL,
-                preference_value TEXT NOT NULL,
-                validation_type VARCHAR(20) DEFAULT 'soft',
-                raw_text TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(user_id, preference_type, preference_value)
-            )
-        """)
+        await ensure_preferences_table(conn)
 
         saved = []
         for value in request.values:
@@ -192,6 +284,7 @@ async def validate_preference(request: SavePreferenceRequest):
                 saved.append(dict(result))
 
         await conn.close()
+        profile_cache.invalidate(request.user_id)
         return {"success": True, "saved": saved}
 
     except HTTPException:
@@ -201,9 +294,114 @@ async def validate_preference(request: SavePreferenceRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def load_profile(user_id: str) -> Optional[UserProfile]:
+    """Read and group a user's preferences; None if the user doesn't exist"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await ensure_preferences_table(conn)
+        rows = await conn.fetch("""
+            SELECT p.preference_type, p.preference_value, p.validation_type
+            FROM users u
+            LEFT JOIN user_repo_preferences p ON p.user_id = u.id
+            WHERE u.neon_auth_id = $1
+            ORDER BY p.created_at
+        """, user_id)
+
+    if not rows:
+        return None
+
+    groups: dict[PreferenceType, PreferenceGroup] = {}
+    for row in rows:
+        if row["preference_type"] is None:
+            continue
+        try:
+            pref_type = PreferenceType(row["preference_type"])
+            status = ValidationType(row["validation_type"] or "soft")
+        except ValueError:
+            continue
+        group = groups.setdefault(pref_type, PreferenceGroup())
+        getattr(group, status.value).append(row["preference_value"])
+
+    return UserProfile(user_id=user_id, preferences=groups)
+
+
+async def cached_profile(user_id: str):
+    """Profile cache entry for a user, loading from Neon on a miss"""
+    entry = profile_cache.get(user_id)
+    if entry is not None:
+        return entry
+
+    generation = profile_cache.generation(user_id)
+    try:
+        try:
+            profile = await load_profile(user_id)
+        except Exception as e:
+            print(f"[Repo Agent] Profile error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        if profile is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return profile_cache.put(user_id, profile.model_dump(mode="json"), generation)
+    finally:
+        profile_cache.release(user_id)
+
+
+@app.get("/profile/{user_id}", response_model=UserProfile)
+async def get_profile(user_id: str, http_request: Request):
+    """Consolidated preferences by type, served from cache with ETag/304"""
+    entry = await cached_profile(user_id)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if profile_cache.not_modified(entry, http_request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=entry.body, headers=headers)
+
+
+async def refresh_matcher():
+    """Pull newly classified jobs into the matcher at most every MATCHER_REFRESH_SECONDS"""
+    global matcher_refreshed_at
+    async with matcher_lock:
+        if time.monotonic() - matcher_refreshed_at < MATCHER_REFRESH_SECONDS:
+            return
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            changed = await job_matcher.refresh(conn)
+        matcher_refreshed_at = time.monotonic()
+        if changed:
+            print(f"[Repo Agent] Matcher refreshed: {changed} jobs, {len(job_matcher)} active")
+
+
+@app.get("/matches/{user_id}")
+async def get_matches(user_id: str, limit: int = 20):
+    """Rank active jobs against a user's profile"""
+    entry = await cached_profile(user_id)
+
+    try:
+        await refresh_matcher()
+    except Exception as e:
+        print(f"[Repo Agent] Matcher refresh error: {e}")
+        if not len(job_matcher):
+            raise HTTPException(status_code=500, detail=str(e))
+
+    profile = UserProfile.model_validate(entry.body)
+    return {"user_id": user_id, "matches": job_matcher.top(profile, max(1, min(limit, 100)))}
+
+
 @app.get("/health")
 async def health():
-    return {"status": "ok", "agent": "repo", "model": "gemini-2.0-flash"}
+    health = {"status": "ok", "agent": "repo", "model": "gemini-2.0-flash", "load": guard.stats()}
+    if write_queue is not None:
+        health["write_behind"] = write_queue.stats()
+    health["profile_cache"] = profile_cache.stats()
+    health["matcher"] = {"jobs": len(job_matcher), "skills": len(job_matcher.skills)}
+    health["http"] = http_pool.stats()
+    return health
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if write_queue is not None:
+        await write_queue.close()
+    await close_pool()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,401 @@
+"""
+Vectorized job-preference matcher.
+
+Classified jobs (see scripts/classify_jobs.py) are held in flat NumPy arrays:
+- skills as a sparse matrix (row, skill id) over a shared vocabulary, with a
+  column-sorted view so scoring only touches the postings of the user's skills
+- role_category / seniority_level / location as integer codes
+- salary_min / salary_max as float32 day rates (NaN when unknown)
+
+Skills are keyed by skills_vocab.normalize(), and profile skills are first
+mapped through the canonical SkillVocabulary (seeds, aliases and terms
+promoted in skill_vocabulary), so "financial modeling" matches jobs listing
+"Financial Modelling".
+
+A UserProfile is scored against every job in one pass. Preference weights:
+`validated` 1.0, `soft` 0.5; `hard` values are constraints applied as masks
+(a job must list every hard skill; a hard role that names no role_category
+falls back to a substring match on the job title).
+Updated jobs are appended and their old row tombstoned, so refreshes never
+rebuild the arrays; compact() reclaims dead rows once they pile up.
+"""
+import re
+from datetime import datetime
+from typing import Iterable, Optional
+
+import numpy as np
+
+from models import PreferenceType, UserProfile
+from skills_vocab import SkillVocabulary, normalize
+
+VALIDATED_WEIGHT = 1.0
+SOFT_WEIGHT = 0.5
+
+# Component weights in the final score
+W_SKILL = 0.45
+W_ROLE = 0.30
+W_LOCATION = 0.15
+W_RATE = 0.10
+
+# Salaries above this are annual; convert to a day rate
+ANNUAL_THRESHOLD = 5000
+WORKING_DAYS = 220
+
+# Compact once this share of rows are tombstones
+COMPACT_RATIO = 0.25
+
+ROLE_CATEGORY_KEYWORDS = {
+    "Finance": ("cfo", "finance", "financial", "fd", "controller", "accounting"),
+    "Engineering": ("cto", "engineering", "technology", "tech", "software", "developer"),
+    "Marketing": ("cmo", "marketing", "growth", "brand", "content"),
+    "Operations": ("coo", "operations", "ops", "programme", "project", "chief of staff"),
+    "Sales": ("cro", "sales", "revenue", "business development", "partnerships"),
+    "HR": ("chro", "hr", "people", "talent", "recruit"),
+    "Product": ("cpo", "product"),
+    "Design": ("design", "ux", "ui"),
+    "Data": ("cdo", "data", "analytics", "bi"),
+    "Legal": ("legal", "counsel", "compliance"),
+    "Customer Success": ("customer", "support", "success"),
+}
+
+
+def role_categories(value: str) -> set[str]:
+    """Map a free-text role preference ("Part-time CFO") to role_category values"""
+    text = value.lower()
+    words = set(re.findall(r"[a-z]+", text))
+    matched = set()
+    for category, keywords in ROLE_CATEGORY_KEYWORDS.items():
+        if text == category.lower() or any(
+            (k in words) if " " not in k else (k in text) for k in keywords
+        ):
+            matched.add(category)
+    return matched
+
+
+def parse_day_rate(value: str) -> Optional[float]:
+    """First amount in a day-rate preference: "£800", "800-1000", "1.2k" -> day rate"""
+    match = re.search(r"(\d[\d,]*(?:\.\d+)?)\s*(k)?", value.lower())
+    if not match:
+        return None
+    amount = float(match.group(1).replace(",", ""))
+    if match.group(2):
+        amount *= 1000
+    return amount / WORKING_DAYS if amount > ANNUAL_THRESHOLD else amount
+
+
+def to_day_rate(amount) -> float:
+    if amount is None:
+        return np.nan
+    amount = float(amount)
+    return amount / WORKING_DAYS if amount > ANNUAL_THRESHOLD else amount
+
+
+class Codes:
+    """String -> dense int code, growing as new values appear"""
+
+    def __init__(self):
+        self.index: dict[str, int] = {}
+        self.values: list[str] = []
+
+    def code(self, value: Optional[str]) -> int:
+        key = (value or "").strip().lower()
+        code = self.index.get(key)
+        if code is None:
+            code = self.index[key] = len(self.values)
+            self.values.append(key)
+        return code
+
+    def lookup(self, weights: dict[int, float]) -> np.ndarray:
+        table = np.zeros(len(self.values), dtype=np.float32)
+        for code, weight in weights.items():
+            table[code] = max(table[code], weight)
+        return table
+
+    def __len__(self):
+        return len(self.values)
+
+
+class JobMatcher:
+    def __init__(self):
+        self.skills = Codes()
+        self.vocabulary = SkillVocabulary()
+        self.roles = Codes()
+        self.seniorities = Codes()
+        self.locations = Codes()
+
+        self.job_ids: list[str] = []
+        self.titles: list[str] = []
+        self.row_of: dict[str, int] = {}
+
+        self.alive = np.zeros(0, dtype=bool)
+        self.role_code = np.zeros(0, dtype=np.int32)
+        self.seniority_code = np.zeros(0, dtype=np.int32)
+        self.location_code = np.zeros(0, dtype=np.int32)
+        self.is_remote = np.zeros(0, dtype=bool)
+        self.salary_min = np.zeros(0, dtype=np.float32)
+        self.salary_max = np.zeros(0, dtype=np.float32)
+
+        # Sparse job x skill matrix in COO form
+        self.skill_rows = np.zeros(0, dtype=np.int32)
+        self.skill_cols = np.zeros(0, dtype=np.int32)
+        # Column-sorted (CSC) view, rebuilt lazily after upserts
+        self._csc: Optional[tuple[np.ndarray, np.ndarray]] = None
+
+        self.watermark: Optional[datetime] = None
+        self.vocabulary_watermark: Optional[datetime] = None
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def upsert_jobs(self, jobs: Iterable[dict]):
+        """
+        Add or replace jobs. Each dict has id, title, role_category,
+        seniority_level, location, is_remote, salary_min, salary_max,
+        skills_required and optionally is_active.
+        """
+        start = len(self.job_ids)
+        ids, titles, roles, seniorities, locations, remote = [], [], [], [], [], []
+        smin, smax, rows, cols = [], [], [], []
+        retired = []
+
+        for job in jobs:
+            job_id = str(job["id"])
+            if job_id in self.row_of:
+                retired.append(self.row_of.pop(job_id))
+            if job.get("is_active") is False:
+                continue
+
+            row = start + len(ids)
+            self.row_of[job_id] = row
+            ids.append(job_id)
+            titles.append(job.get("title") or "")
+            roles.append(self.roles.code(job.get("role_category")))
+            seniorities.append(self.seniorities.code(job.get("seniority_level")))
+            locations.append(self.locations.code(job.get("location")))
+            remote.append(bool(job.get("is_remote")))
+            smin.append(to_day_rate(job.get("salary_min")))
+            smax.append(to_day_rate(job.get("salary_max")))
+
+            skill_ids = {self.skills.code(normalize(s)) for s in job.get("skills_required") or [] if s}
+            rows.extend([row] * len(skill_ids))
+            cols.extend(skill_ids)
+
+        if retired:
+            self.alive[np.asarray(retired, dtype=np.int64)] = False
+
+        if ids:
+            self.job_ids.extend(ids)
+            self.titles.extend(titles)
+            self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+            self.role_code = np.concatenate([self.role_code, np.asarray(roles, dtype=np.int32)])
+            self.seniority_code = np.concatenate([self.seniority_code, np.asarray(seniorities, dtype=np.int32)])
+            self.location_code = np.concatenate([self.location_code, np.asarray(locations, dtype=np.int32)])
+            self.is_remote = np.concatenate([self.is_remote, np.asarray(remote, dtype=bool)])
+            self.salary_min = np.concatenate([self.salary_min, np.asarray(smin, dtype=np.float32)])
+            self.salary_max = np.concatenate([self.salary_max, np.asarray(smax, dtype=np.float32)])
+            self.skill_rows = np.concatenate([self.skill_rows, np.asarray(rows, dtype=np.int32)])
+            self.skill_cols = np.concatenate([self.skill_cols, np.asarray(cols, dtype=np.int32)])
+
+        self._csc = None
+        dead = len(self.job_ids) - len(self)
+        if self.job_ids and dead / len(self.job_ids) > COMPACT_RATIO:
+            self.compact()
+
+    def compact(self):
+        """Drop tombstoned rows and renumber"""
+        keep = np.flatnonzero(self.alive)
+        new_row = np.full(len(self.job_ids), -1, dtype=np.int32)
+        new_row[keep] = np.arange(len(keep), dtype=np.int32)
+
+        live_entries = self.alive[self.skill_rows]
+        self.skill_rows = new_row[self.skill_rows[live_entries]]
+        self.skill_cols = self.skill_cols[live_entries]
+
+        for name in ("role_code", "seniority_code", "location_code", "is_remote",
+                     "salary_min", "salary_max"):
+            setattr(self, name, getattr(self, name)[keep])
+        self.alive = np.ones(len(keep), dtype=bool)
+
+        self._csc = None
+        self.job_ids = [self.job_ids[i] for i in keep]
+        self.titles = [self.titles[i] for i in keep]
+        self.row_of = {job_id: row for row, job_id in enumerate(self.job_ids)}
+
+    def postings(self, skill_code: int) -> np.ndarray:
+        """Rows (live or tombstoned) that list a skill"""
+        if self._csc is None:
+            order = np.argsort(self.skill_cols, kind="stable")
+            indptr = np.zeros(len(self.skills) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.skill_cols, minlength=len(self.skills)), out=indptr[1:])
+            self._csc = (indptr, self.skill_rows[order])
+        indptr, rows = self._csc
+        if skill_code >= len(indptr) - 1:
+            return rows[:0]
+        return rows[indptr[skill_code]:indptr[skill_code + 1]]
+
+    async def refresh(self, conn):
+        """Pull jobs classified or changed since the last refresh"""
+        query = """
+            SELECT id, title, role_category, seniority_level, location, is_remote,
+                   salary_min, salary_max, skills_required, is_active, updated_date
+            FROM jobs
+        """
+        await self.load_vocabulary(conn)
+        if self.watermark is None:
+            rows = await conn.fetch(query + " WHERE is_active = true")
+        else:
+            rows = await conn.fetch(query + " WHERE updated_date > $1", self.watermark)
+
+        if rows:
+            self.upsert_jobs(dict(r) for r in rows)
+            latest = max((r["updated_date"] for r in rows if r["updated_date"]), default=None)
+            if latest is not None and (self.watermark is None or latest > self.watermark):
+                self.watermark = latest
+        elif self.watermark is None:
+            self.watermark = datetime.min
+        return len(rows)
+
+    async def load_vocabulary(self, conn):
+        """Add skill aliases promoted by scripts/classify_jobs.py since the last refresh"""
+        import asyncpg
+
+        query = "SELECT key, canonical, updated_at FROM skill_vocabulary WHERE promoted"
+        try:
+            if self.vocabulary_watermark is None:
+                rows = await conn.fetch(query)
+            else:
+                rows = await conn.fetch(query + " AND updated_at > $1", self.vocabulary_watermark)
+        except asyncpg.UndefinedTableError:
+            return
+        for row in rows:
+            self.vocabulary.trie.insert(row["key"], row["canonical"])
+        latest = max((r["updated_at"] for r in rows if r["updated_at"]), default=None)
+        if latest is not None and (self.vocabulary_watermark is None or latest > self.vocabulary_watermark):
+            self.vocabulary_watermark = latest
+
+    def skill_code(self, value: str) -> Optional[int]:
+        """Code of a profile skill after mapping it to its canonical name"""
+        canonical = self.vocabulary.lookup(value) or value
+        return self.skills.index.get(normalize(canonical))
+
+    def score(self, profile: UserProfile) -> tuple[np.ndarray, np.ndarray]:
+        """(score per row, eligible mask) for every row"""
+        n = len(self.job_ids)
+        prefs = profile.preferences
+        eligible = self.alive.copy()
+        score = np.zeros(n, dtype=np.float32)
+
+        def weighted(pref_type: PreferenceType) -> list[tuple[str, float]]:
+            group = prefs.get(pref_type)
+            if group is None:
+                return []
+            return (
+                [(v, VALIDATED_WEIGHT) for v in group.validated]
+                + [(v, SOFT_WEIGHT) for v in group.soft]
+                + [(v, VALIDATED_WEIGHT) for v in group.hard]
+            )
+
+        def hard(pref_type: PreferenceType) -> list[str]:
+            group = prefs.get(pref_type)
+            return group.hard if group is not None else []
+
+        # Skills: weighted overlap / number of preferred skills
+        skill_weights = {}
+        for value, weight in weighted(PreferenceType.SKILL):
+            code = self.skill_code(value)
+            if code is not None:
+                skill_weights[code] = max(skill_weights.get(code, 0.0), weight)
+        if skill_weights:
+            overlap = np.zeros(n, dtype=np.float32)
+            for code, weight in skill_weights.items():
+                overlap[self.postings(code)] += weight
+            score += W_SKILL * overlap / len(skill_weights)
+
+        # Hard skills: every one must be listed (an unknown skill matches no job)
+        for value in hard(PreferenceType.SKILL):
+            code = self.skill_code(value)
+            listed = np.zeros(n, dtype=bool)
+            if code is not None:
+                listed[self.postings(code)] = True
+            eligible &= listed
+
+        # Roles: via role_category codes
+        role_weights = {}
+        for value, weight in weighted(PreferenceType.ROLE):
+            for category in role_categories(value):
+                code = self.roles.index.get(category.lower())
+                if code is not None:
+                    role_weights[code] = max(role_weights.get(code, 0.0), weight)
+        if role_weights:
+            score += W_ROLE * self.roles.lookup(role_weights)[self.role_code]
+
+        # Hard roles: by category where the value names one, else by title
+        hard_roles, hard_titles = set(), []
+        for value in hard(PreferenceType.ROLE):
+            categories = role_categories(value)
+            if categories:
+                hard_roles.update(self.roles.index.get(c.lower()) for c in categories)
+            elif value.strip():
+                hard_titles.append(value.strip().lower())
+        if hard_roles or hard_titles:
+            hard_roles.discard(None)
+            role_mask = np.isin(self.role_code, list(hard_roles))
+            if hard_titles:
+                role_mask |= np.fromiter(
+                    (any(t in title.lower() for t in hard_titles) for title in self.titles), dtype=bool, count=n
+                )
+            eligible &= role_mask
+
+        # Locations: substring match over the (small) location vocabulary; "remote" uses is_remote
+        def location_match(values: list[tuple[str, float]]) -> np.ndarray:
+            weights, remote_weight = {}, 0.0
+            for value, weight in values:
+                needle = value.strip().lower()
+                if "remote" in needle:
+                    remote_weight = max(remote_weight, weight)
+                    continue
+                for code, location in enumerate(self.locations.values):
+                    if needle and needle in location:
+                        weights[code] = max(weights.get(code, 0.0), weight)
+            match = self.locations.lookup(weights)[self.location_code] if weights else np.zeros(n, dtype=np.float32)
+            if remote_weight:
+                match = np.maximum(match, self.is_remote * np.float32(remote_weight))
+            return match
+
+        location_prefs = weighted(PreferenceType.LOCATION)
+        if location_prefs:
+            score += W_LOCATION * location_match(location_prefs)
+        if hard(PreferenceType.LOCATION):
+            eligible &= location_match([(v, 1.0) for v in hard(PreferenceType.LOCATION)]) > 0
+
+        # Day rate: jobs whose top rate reaches the user's minimum; unknown salary passes at half credit
+        rates = [(parse_day_rate(v), w) for v, w in weighted(PreferenceType.DAY_RATE)]
+        rates = [(r, w) for r, w in rates if r is not None]
+        if rates:
+            minimum = max(r for r, _ in rates)
+            weight = max(w for _, w in rates)
+            top = np.where(np.isnan(self.salary_max), self.salary_min, self.salary_max)
+            known = ~np.isnan(top)
+            meets = known & (top >= minimum)
+            score += W_RATE * weight * np.where(known, meets, 0.5).astype(np.float32)
+            hard_rates = [parse_day_rate(v) for v in hard(PreferenceType.DAY_RATE)]
+            hard_rates = [r for r in hard_rates if r is not None]
+            if hard_rates:
+                eligible &= ~known | (top >= max(hard_rates))
+
+        return score, eligible
+
+    def top(self, profile: UserProfile, limit: int = 20) -> list[dict]:
+        """Best `limit` eligible jobs, highest score first"""
+        if not self.job_ids:
+            return []
+        score, eligible = self.score(profile)
+        candidates = np.flatnonzero(eligible)
+        if len(candidates) > limit:
+            best = np.argpartition(-score[candidates], limit)[:limit]
+            candidates = candidates[best]
+        ordered = candidates[np.argsort(-score[candidates], kind="stable")]
+        return [
+            {"job_id": self.job_ids[i], "title": self.titles[i], "score": round(float(score[i]), 4)}
+            for i in ordered
+        ]
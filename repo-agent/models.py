@@ -54,3 +54,22 @@ class SavePreferenceRequest(BaseModel):
     values: list[str]
     validation_type: ValidationType
     raw_text: Optional[str] = None
+
+
+class BatchExtractionRequest(BaseModel):
+    requests: list[ExtractionRequest] = Field(min_length=1, max_length=5000)
+    # Further capped by the shared BATCH_MAX_IN_FLIGHT budget (default 8)
+    concurrency: int = Field(default=8, ge=1, le=8)
+    rate_per_second: float = Field(default=0.0, ge=0.0)
+    save: bool = False
+
+
+class PreferenceGroup(BaseModel):
+    hard: list[str] = Field(default_factory=list)
+    soft: list[str] = Field(default_factory=list)
+    validated: list[str] = Field(default_factory=list)
+
+
+class UserProfile(BaseModel):
+    user_id: str
+    preferences: dict[PreferenceType, PreferenceGroup]
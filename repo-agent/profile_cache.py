@@ -0,0 +1,100 @@
+"""
+In-memory cache of consolidated user profiles for GET /profile/{user_id}.
+
+Entries hold the serialized body and its ETag. Writes invalidate by user,
+and a per-user generation counter stops a read that raced with a write from
+caching the stale result. Generations are only kept while a read for that
+user is in flight, so memory stays bounded by the LRU plus concurrent reads. The TTL bounds staleness from writers in other
+processes (other workers, batch_extract.py, the Next.js routes).
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+PROFILE_CACHE_TTL = int(os.environ.get("PROFILE_CACHE_TTL", "600"))
+PROFILE_CACHE_SIZE = int(os.environ.get("PROFILE_CACHE_SIZE", "10000"))
+
+
+class CachedProfile:
+    __slots__ = ("body", "etag", "stored_at")
+
+    def __init__(self, body: dict):
+        self.body = body
+        digest = hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()[:20]
+        self.etag = f'"{digest}"'
+        self.stored_at = time.monotonic()
+
+
+class ProfileCache:
+    def __init__(self, ttl: int = PROFILE_CACHE_TTL, max_entries: int = PROFILE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[str, CachedProfile] = OrderedDict()
+        # Only for users with a read in flight (generation() .. release())
+        self._generations: dict[str, int] = {}
+        self._readers: dict[str, int] = {}
+
+    def get(self, user_id: str) -> Optional[CachedProfile]:
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry.stored_at > self.ttl:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry
+
+    def generation(self, user_id: str) -> int:
+        """Read before loading from the database; pass to put(), then release()"""
+        self._readers[user_id] = self._readers.get(user_id, 0) + 1
+        return self._generations.get(user_id, 0)
+
+    def release(self, user_id: str):
+        """End a read started with generation()"""
+        readers = self._readers.get(user_id, 0) - 1
+        if readers > 0:
+            self._readers[user_id] = readers
+        else:
+            self._readers.pop(user_id, None)
+            self._generations.pop(user_id, None)
+
+    def put(self, user_id: str, body: dict, generation: int) -> CachedProfile:
+        entry = CachedProfile(body)
+        if self._generations.get(user_id, 0) != generation:
+            # Invalidated while we were reading - serve it, don't keep it
+            return entry
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_id: str):
+        # Nobody mid-read means nobody can put a stale result; no need to track
+        if user_id in self._readers:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self._entries.pop(user_id, None)
+        self.invalidations += 1
+
+    def invalidate_many(self, user_ids: Iterable[str]):
+        for user_id in user_ids:
+            self.invalidate(user_id)
+
+    def not_modified(self, entry: CachedProfile, if_none_match: str) -> bool:
+        """If-None-Match check: weak comparison, `*` matches anything"""
+        tags = [tag.strip() for tag in if_none_match.split(",") if tag.strip()]
+        return any(tag == "*" or tag.removeprefix("W/") == entry.etag for tag in tags)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "reads_in_flight": len(self._readers),
+        }
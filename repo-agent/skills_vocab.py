@@ -0,0 +1,415 @@
+"""
+Canonical skills vocabulary and skill -> job posting index.
+
+StructuredJob.skills_required is free text, so "Financial Modelling",
+"financial modeling" and "Fin. Modelling" would otherwise be separate skills.
+SkillVocabulary maps each extracted skill to one canonical name:
+
+1. normalize: case, punctuation, abbreviations, US -> UK spelling
+2. exact lookup in a trie of known keys (seeds, aliases, promoted terms)
+3. fuzzy lookup against known keys sharing a prefix: same words, differing
+   only by typos or plurals ("Stakeholder Managment", "Risk Managements")
+4. otherwise the term is tracked as pending and promoted to the vocabulary
+   once it has appeared in PROMOTE_MIN_JOBS different jobs
+
+Only single-edit typos on longer words are persisted as aliases; other fuzzy
+hits are cached for the current run only.
+
+SkillIndex keeps skill -> job id posting lists in Neon so facet counts and
+skill filters are single-row lookups instead of scans over jobs.skills_required.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Iterable, Optional
+
+PROMOTE_MIN_JOBS = 3
+# Fuzzy candidates must share this many leading characters
+FUZZY_PREFIX = 3
+# Edits allowed per differing word (words of LONG_WORD+ chars get 2), and per skill
+FUZZY_WORD_EDITS = 1
+FUZZY_TOTAL_EDITS = 2
+LONG_WORD = 10
+# Words this short (CFO, SEO, SQL) or containing digits must match exactly
+MIN_FUZZY_WORD = 4
+# A fuzzy hit is saved as an alias only if it is one edit in a word this long
+PERSIST_MIN_WORD = 6
+
+SEED_SKILLS = [
+    "Financial Modelling", "FP&A", "M&A", "Board Reporting", "Fundraising",
+    "Cash Flow Management", "Budgeting", "Forecasting", "Management Accounts",
+    "IFRS", "Treasury", "Investor Relations", "Due Diligence", "P&L Management",
+    "Risk Management", "Compliance", "Strategic Planning", "Stakeholder Management",
+    "Change Management", "Project Management", "Programme Management",
+    "Process Improvement", "Operations Management", "Supply Chain Management",
+    "Team Leadership", "Commercial Acumen", "Negotiation", "Business Development",
+    "Sales Leadership", "Pricing Strategy", "Go-to-Market Strategy",
+    "Digital Marketing", "Brand Strategy", "Content Marketing", "Demand Generation",
+    "SEO", "Product Strategy", "Product Management", "Data Analytics",
+    "Cloud Architecture", "Cybersecurity", "Agile", "Python",
+    "Talent Acquisition", "Employee Relations", "Organisational Design",
+]
+
+ALIASES = {
+    "financial planning and analysis": "FP&A",
+    "mergers and acquisitions": "M&A",
+    "m and a": "M&A",
+    "p and l": "P&L Management",
+    "p&l": "P&L Management",
+    "profit and loss management": "P&L Management",
+    "gtm strategy": "Go-to-Market Strategy",
+    "go to market": "Go-to-Market Strategy",
+    "search engine optimisation": "SEO",
+    "cyber security": "Cybersecurity",
+    "stakeholder engagement": "Stakeholder Management",
+}
+
+ABBREVIATIONS = {
+    "fin": "financial",
+    "mgmt": "management",
+    "mgt": "management",
+    "mktg": "marketing",
+    "ops": "operations",
+    "dev": "development",
+    "strat": "strategy",
+    "acct": "accounting",
+}
+
+US_TO_UK = {
+    "modeling": "modelling",
+    "modeler": "modeller",
+    "program": "programme",
+    "analyze": "analyse",
+    "analyzing": "analysing",
+    "behavior": "behaviour",
+    "center": "centre",
+    "catalog": "catalogue",
+    "license": "licence",
+}
+
+
+# Job skills repeat heavily, so normalizing every job on a matcher refresh is mostly hits
+@lru_cache(maxsize=65536)
+def normalize(skill: str) -> str:
+    """Lookup key for a skill string"""
+    text = unicodedata.normalize("NFKC", skill).lower().strip()
+    text = text.replace("&", " & ")
+    # Keep & + # (M&A, C++, C#); everything else separates words
+    words = re.findall(r"[a-z0-9+#&]+", text)
+    out = []
+    for word in words:
+        if word == "and":
+            word = "&"
+        word = ABBREVIATIONS.get(word, word)
+        word = US_TO_UK.get(word, word)
+        if word.endswith("ization") or word.endswith("izations"):
+            word = word.replace("ization", "isation")
+        out.append(word)
+    return " ".join(out).replace(" & ", "&")
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance with adjacent transpositions, stopping once past `limit`"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1]
+
+
+def typo_edits(key: str, candidate: str) -> Optional[tuple[int, int]]:
+    """
+    (total edits, length of the longest differing word) if `key` is `candidate`
+    with small typos or plurals word by word, else None. Different words such as
+    product/project or architect/architecture are never a typo.
+    """
+    words, other = key.split(), candidate.split()
+    if len(words) != len(other):
+        return None
+    total, longest = 0, 0
+    for word, target in zip(words, other):
+        if word == target:
+            continue
+        if len(target) < MIN_FUZZY_WORD or any(ch.isdigit() for ch in word + target):
+            return None
+        allowed = FUZZY_WORD_EDITS + (len(target) >= LONG_WORD)
+        edits = edit_distance(word, target, allowed)
+        if edits > allowed:
+            return None
+        total += edits
+        longest = max(longest, len(target))
+    if total == 0 or total > FUZZY_TOTAL_EDITS:
+        return None
+    return total, longest
+
+
+class _TrieNode:
+    __slots__ = ("children", "canonical")
+
+    def __init__(self):
+        self.children: dict[str, "_TrieNode"] = {}
+        self.canonical: Optional[str] = None
+
+
+class SkillTrie:
+    """Character trie over normalized keys -> canonical name"""
+
+    def __init__(self):
+        self.root = _TrieNode()
+        self.size = 0
+
+    def insert(self, key: str, canonical: str):
+        node = self.root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+        if node.canonical is None:
+            self.size += 1
+        node.canonical = canonical
+
+    def get(self, key: str) -> Optional[str]:
+        node = self._walk(key)
+        return node.canonical if node else None
+
+    def with_prefix(self, prefix: str) -> list[tuple[str, str]]:
+        """All (key, canonical) pairs under a prefix"""
+        node = self._walk(prefix)
+        if node is None:
+            return []
+        found, stack = [], [(node, prefix)]
+        while stack:
+            node, key = stack.pop()
+            if node.canonical is not None:
+                found.append((key, node.canonical))
+            stack.extend((child, key + ch) for ch, child in node.children.items())
+        return found
+
+    def _walk(self, key: str) -> Optional[_TrieNode]:
+        node = self.root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def __len__(self):
+        return self.size
+
+
+class SkillVocabulary:
+    def __init__(self, seeds: Iterable[str] = SEED_SKILLS, aliases: dict = ALIASES):
+        self.trie = SkillTrie()
+        # key -> [display, job ids seen] for terms not yet promoted
+        self.pending: dict[str, list] = {}
+        self.promoted: list[str] = []
+        # Fuzzy hits not trusted enough to persist, remembered for this run
+        self._fuzzy_hits: dict[str, str] = {}
+        # Keys whose canonical changed or were added since load(), for save()
+        self._dirty: set[str] = set()
+
+        for skill in seeds:
+            self.trie.insert(normalize(skill), skill)
+        for alias, canonical in aliases.items():
+            self.trie.insert(normalize(alias), canonical)
+
+    def lookup(self, skill: str) -> Optional[str]:
+        """Canonical name for a skill, without recording anything"""
+        key = normalize(skill)
+        canonical = self._resolve(key)
+        if canonical is None and key in self.pending:
+            return self.pending[key][0]
+        return canonical
+
+    def canonicalize(self, skills: Iterable[str], job_id: Optional[str] = None) -> list[str]:
+        """Map a job's skills to canonical names (deduplicated, order kept)"""
+        result, seen = [], set()
+        for skill in skills:
+            key = normalize(skill)
+            display = skill.strip()
+            if display.islower():
+                display = display.title()
+            canonical = self._resolve(key) or self._observe(key, display, job_id)
+            if canonical and canonical not in seen:
+                seen.add(canonical)
+                result.append(canonical)
+        return result
+
+    def _resolve(self, key: str) -> Optional[str]:
+        """Exact, then fuzzy, match against known keys"""
+        if not key:
+            return None
+        canonical = self.trie.get(key) or self._fuzzy_hits.get(key)
+        if canonical is not None:
+            return canonical
+        match = self._fuzzy(key)
+        if match is None:
+            return None
+        canonical, (edits, word_length) = match
+        if edits == 1 and word_length >= PERSIST_MIN_WORD:
+            # A plain typo: save it as an alias so it's exact next time
+            self.trie.insert(key, canonical)
+            self._dirty.add(key)
+        else:
+            self._fuzzy_hits[key] = canonical
+        return canonical
+
+    def _observe(self, key: str, display: str, job_id: Optional[str]) -> Optional[str]:
+        if not key:
+            return None
+        entry = self.pending.setdefault(key, [display, set()])
+        self._dirty.add(key)
+        if job_id is not None:
+            entry[1].add(job_id)
+        if len(entry[1]) >= PROMOTE_MIN_JOBS:
+            self.trie.insert(key, entry[0])
+            self.promoted.append(entry[0])
+            del self.pending[key]
+        return entry[0]
+
+    def _fuzzy(self, key: str) -> Optional[tuple[str, tuple[int, int]]]:
+        """Closest known key that differs from `key` only by typos"""
+        if len(key) < FUZZY_PREFIX:
+            return None
+        best = None
+        for candidate, canonical in self.trie.with_prefix(key[:FUZZY_PREFIX]):
+            edits = typo_edits(key, candidate)
+            if edits is not None and (best is None or edits[0] < best[1][0]):
+                best = (canonical, edits)
+        return best
+
+    def load(self, conn):
+        """Merge vocabulary persisted by earlier runs"""
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT key, canonical, promoted, job_ids FROM skill_vocabulary
+            """)
+            for key, canonical, promoted, job_ids in cur.fetchall():
+                if promoted:
+                    self.trie.insert(key, canonical)
+                else:
+                    self.pending[key] = [canonical, set(job_ids or [])]
+
+    def save(self, conn):
+        """Persist keys added or changed this run"""
+        rows = []
+        for key in self._dirty:
+            if key in self.pending:
+                display, job_ids = self.pending[key]
+                rows.append((key, display, False, sorted(job_ids)))
+            else:
+                canonical = self.trie.get(key)
+                if canonical is not None:
+                    rows.append((key, canonical, True, []))
+        if not rows:
+            return
+        with conn.cursor() as cur:
+            cur.executemany("""
+                INSERT INTO skill_vocabulary (key, canonical, promoted, job_ids)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (key) DO UPDATE SET
+                    canonical = EXCLUDED.canonical,
+                    promoted = skill_vocabulary.promoted OR EXCLUDED.promoted,
+                    job_ids = CASE WHEN EXCLUDED.promoted THEN '{}'
+                              ELSE ARRAY(SELECT DISTINCT unnest(skill_vocabulary.job_ids || EXCLUDED.job_ids)) END,
+                    updated_at = NOW()
+            """, rows)
+        self._dirty.clear()
+
+
+class SkillIndex:
+    """skill -> job id posting lists in Neon"""
+
+    @staticmethod
+    def update_job(conn, job_id: str, old_skills: Iterable[str], new_skills: Iterable[str]):
+        """Move a job's postings from its previous skills to its new ones"""
+        old, new = set(old_skills or []), set(new_skills or [])
+        job_id = str(job_id)
+        with conn.cursor() as cur:
+            if old - new:
+                cur.execute("""
+                    UPDATE skill_postings
+                    SET job_ids = array_remove(job_ids, %s), updated_at = NOW()
+                    WHERE skill = ANY(%s)
+                """, (job_id, list(old - new)))
+            if new - old:
+                cur.execute("""
+                    INSERT INTO skill_postings (skill, job_ids)
+                    SELECT skill, ARRAY[%s] FROM unnest(%s::text[]) AS skill
+                    ON CONFLICT (skill) DO UPDATE SET
+                        job_ids = CASE WHEN %s = ANY(skill_postings.job_ids) THEN skill_postings.job_ids
+                                  ELSE array_append(skill_postings.job_ids, %s) END,
+                        updated_at = NOW()
+                """, (job_id, list(new - old), job_id, job_id))
+
+    @staticmethod
+    def prune_inactive(conn) -> int:
+        """Drop deactivated or deleted jobs from every posting list; returns skills touched"""
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE skill_postings sp
+                SET job_ids = kept.job_ids, updated_at = NOW()
+                FROM (
+                    SELECT p.skill,
+                           COALESCE(array_agg(j) FILTER (WHERE a.id IS NOT NULL), '{}') AS job_ids,
+                           COUNT(*) FILTER (WHERE a.id IS NULL) AS dropped
+                    FROM skill_postings p
+                    CROSS JOIN LATERAL unnest(p.job_ids) AS j
+                    LEFT JOIN (SELECT id::text AS id FROM jobs WHERE is_active = true) a ON a.id = j
+                    GROUP BY p.skill
+                ) kept
+                WHERE kept.skill = sp.skill AND kept.dropped > 0
+            """)
+            return cur.rowcount
+
+    @staticmethod
+    def facet_counts(conn, limit: int = 50) -> list[tuple[str, int]]:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT skill, cardinality(job_ids) AS jobs
+                FROM skill_postings
+                WHERE cardinality(job_ids) > 0
+                ORDER BY jobs DESC
+                LIMIT %s
+            """, (limit,))
+            return cur.fetchall()
+
+    @staticmethod
+    def jobs_with(conn, skills: list[str]) -> list[str]:
+        """Job ids listing every one of `skills`"""
+        if not skills:
+            return []
+        with conn.cursor() as cur:
+            cur.execute("SELECT job_ids FROM skill_postings WHERE skill = ANY(%s)", (skills,))
+            postings = [set(row[0]) for row in cur.fetchall()]
+        if len(postings) < len(set(skills)):
+            return []
+        postings.sort(key=len)
+        return sorted(set.intersection(*postings)) if postings else []
+
+
+def ensure_tables(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS skill_vocabulary (
+                key TEXT PRIMARY KEY,
+                canonical TEXT NOT NULL,
+                promoted BOOLEAN DEFAULT false,
+                job_ids TEXT[] DEFAULT '{}',
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS skill_postings (
+                skill TEXT PRIMARY KEY,
+                job_ids TEXT[] NOT NULL DEFAULT '{}',
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
@@ -0,0 +1,158 @@
+"""
+Group-commit write-behind queue for /validate.
+
+Saves are queued in-process and flushed every FLUSH_MS milliseconds or every
+MAX_BATCH requests as one multi-user upsert transaction. Each caller awaits
+the flush containing its request, so the acknowledgement is still durable.
+If the group transaction fails, each request is retried in its own so only
+the bad one errors; repeated saves of a value resolve last-write-wins, as
+direct /validate does.
+"""
+import asyncio
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+
+from db import bulk_upsert_preferences, ensure_preferences_table, get_pool, resolve_user_ids
+from models import SavePreferenceRequest
+
+FLUSH_MS = int(os.environ.get("WRITE_BEHIND_FLUSH_MS", "5"))
+MAX_BATCH = int(os.environ.get("WRITE_BEHIND_MAX_BATCH", "100"))
+
+
+class PreferenceWriteQueue:
+    def __init__(self, flush_ms: int = FLUSH_MS, max_batch: int = MAX_BATCH):
+        self.flush_interval = flush_ms / 1000
+        self.max_batch = max_batch
+        self.flushes = 0
+        self.items_flushed = 0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Task] = None
+        # Group being collected by _run, kept here so close() can flush it
+        self._collecting: list = []
+
+    async def submit(self, request: SavePreferenceRequest) -> list[dict]:
+        """Queue a save and wait until its group has committed"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((request, future))
+        return await future
+
+    async def close(self):
+        """Flush whatever is queued or being collected, then stop the flusher"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        if self._flushing is not None:
+            await asyncio.gather(self._flushing, return_exceptions=True)
+        remaining, self._collecting = self._collecting, []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        if remaining:
+            await self._flush(remaining)
+        for _, future in remaining:
+            if not future.done():
+                future.set_exception(HTTPException(status_code=503, detail="Write queue closed"))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._collecting = [await self._queue.get()]
+            flush_at = loop.time() + self.flush_interval
+
+            while len(batch) < self.max_batch:
+                remaining = flush_at - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            self._collecting = []
+            # Shield so close() cancelling the loop can't abort a commit mid-flight
+            self._flushing = asyncio.create_task(self._flush(batch))
+            await asyncio.shield(self._flushing)
+
+    async def _flush(self, batch: list[tuple[SavePreferenceRequest, asyncio.Future]]):
+        try:
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                try:
+                    groups = [(batch, await self._save(conn, batch))]
+                except Exception as e:
+                    if len(batch) == 1:
+                        raise
+                    # One bad row (e.g. NUL in raw_text) must not fail everyone else
+                    print(f"[Repo Agent] Write-behind flush error, retrying {len(batch)} individually: {e}")
+                    groups = []
+                    for item in batch:
+                        try:
+                            groups.append(([item], await self._save(conn, [item])))
+                        except Exception as item_error:
+                            self._fail([item], item_error)
+
+        except Exception as e:
+            print(f"[Repo Agent] Write-behind flush error: {e}")
+            self._fail(batch, e)
+            return
+
+        self.flushes += 1
+        self.items_flushed += sum(len(group) for group, _ in groups)
+        for group, (user_ids, saved) in groups:
+            self._resolve(group, user_ids, saved)
+
+    @staticmethod
+    async def _save(conn, batch) -> tuple[dict[str, int], list[dict]]:
+        """Upsert a group of requests in one transaction"""
+        async with conn.transaction():
+            await ensure_preferences_table(conn)
+
+            user_ids = await resolve_user_ids(conn, (req.user_id for req, _ in batch))
+            rows = [
+                (user_ids[req.user_id], req.preference_type.value, value,
+                 req.validation_type.value, req.raw_text)
+                for req, _ in batch if req.user_id in user_ids
+                for value in req.values
+            ]
+            return user_ids, await bulk_upsert_preferences(conn, rows)
+
+    @staticmethod
+    def _fail(batch, error: Exception):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(HTTPException(status_code=500, detail=str(error)))
+
+    @staticmethod
+    def _resolve(batch, user_ids: dict[str, int], saved: list[dict]):
+        by_key = {(r["user_id"], r["preference_type"], r["preference_value"]): r for r in saved}
+        for req, future in batch:
+            if future.done():
+                continue
+            internal_id = user_ids.get(req.user_id)
+            if internal_id is None:
+                future.set_exception(HTTPException(status_code=404, detail="User not found"))
+                continue
+            future.set_result([
+                {
+                    "id": row["id"],
+                    "preference_value": row["preference_value"],
+                    "validation_type": row["validation_type"],
+                }
+                for value in req.values
+                if (row := by_key.get((internal_id, req.preference_type.value, value)))
+            ])
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "flushes": self.flushes,
+            "items_flushed": self.items_flushed,
+        }
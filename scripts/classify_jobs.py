@@ -3,25 +3,32 @@
 Pydantic AI Job Classification Script
 
 ETL Pipeline:
-1. Read from raw_jobs table (staging)
+1. Read from raw_jobs table (staging), highest priority first (scheduler.py)
 2. Process with Pydantic AI to extract and structure
-3. Update structured jobs table
-4. Mark raw_jobs as processed
+3. Map skills to the canonical vocabulary (repo-agent/skills_vocab.py)
+4. Update structured jobs table and skill -> job posting index
+5. Mark raw_jobs as processed
 
 Every job gets the full Condé Nast editorial treatment.
 """
 
 import os
+import sys
 import json
 import asyncio
-import httpx
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
 
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from pydantic import BaseModel, Field
-from pydantic_ai import Agent
+
+# Python modules shared with the repo-agent service live in repo-agent/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "repo-agent"))
+
+import http_pool
+from scheduler import SCAN_LIMIT, age_hours, format_duration, freshness_report, percentiles, schedule
+from skills_vocab import SkillIndex, SkillVocabulary, ensure_tables as ensure_skill_tables
 
 # ZEP sync configuration
 ZEP_SYNC_ENABLED = os.environ.get('ZEP_SYNC_ENABLED', 'true').lower() == 'true'
@@ -151,9 +158,12 @@ class StructuredJob(BaseModel):
     """)
 
 
+# Jobs are classified one at a time: one Gemini call plus one ZEP sync in flight
+http_pool.configure(concurrency=2)
+
 # Create the Pydantic AI agent using Google Gemini
 # Set GEMINI_API_KEY or GOOGLE_API_KEY in environment
-agent = Agent(
+agent = http_pool.build_agent(
     'google-gla:gemini-2.0-flash',
     output_type=StructuredJob,
     system_prompt="""You are the senior content editor for Parttime.Quest, the UK's premier platform for part-time executive opportunities.
@@ -244,32 +254,50 @@ def get_db_connection():
 
 
 def fetch_pending_raw_jobs(conn, limit: int = 10, source: str = None) -> list[dict]:
-    """Fetch raw jobs pending classification"""
+    """Fetch the highest-priority raw jobs pending classification (see scheduler.py)"""
+    source_filter = "AND r.source = %s" if source else ""
+    source_params = [source] if source else []
+
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        if source:
-            cur.execute("""
-                SELECT r.id as raw_id, r.source, r.source_id, r.raw_data, r.job_id,
-                       j.title, j.company_name, j.location, j.full_description,
-                       j.employment_type, j.seniority_level, j.compensation
+        # Cheap columns only: the newest SCAN_LIMIT rows plus the oldest
+        # `limit`, so starving rows are always considered
+        cur.execute(f"""
+            WITH pending AS (
+                SELECT r.id as raw_id, r.source, r.received_at,
+                       COALESCE(j.title, r.raw_data::jsonb->>'job_title') as title,
+                       COALESCE(j.location, r.raw_data::jsonb->>'location') as location,
+                       COALESCE(j.employment_type, r.raw_data::jsonb->>'employment_type') as employment_type
                 FROM raw_jobs r
                 LEFT JOIN jobs j ON r.job_id = j.id
                 WHERE r.processing_status = 'pending'
-                AND r.source = %s
-                ORDER BY r.received_at DESC
-                LIMIT %s
-            """, (source, limit))
-        else:
-            cur.execute("""
-                SELECT r.id as raw_id, r.source, r.source_id, r.raw_data, r.job_id,
-                       j.title, j.company_name, j.location, j.full_description,
-                       j.employment_type, j.seniority_level, j.compensation
-                FROM raw_jobs r
-                LEFT JOIN jobs j ON r.job_id = j.id
-                WHERE r.processing_status = 'pending'
-                ORDER BY r.received_at DESC
-                LIMIT %s
-            """, (limit,))
-        return [dict(row) for row in cur.fetchall()]
+                {source_filter}
+            )
+            (SELECT * FROM pending ORDER BY received_at DESC LIMIT %s)
+            UNION ALL
+            (SELECT * FROM pending ORDER BY received_at ASC LIMIT %s)
+        """, (*source_params, SCAN_LIMIT, limit))
+        candidates = {row['raw_id']: dict(row) for row in cur.fetchall()}
+
+        chosen = schedule(list(candidates.values()), limit)
+        if not chosen:
+            return []
+
+        cur.execute("""
+            SELECT r.id as raw_id, r.source, r.source_id, r.raw_data, r.job_id, r.received_at,
+                   j.title, j.company_name, j.location, j.full_description,
+                   j.employment_type, j.seniority_level, j.compensation,
+                   j.skills_required AS previous_skills
+            FROM raw_jobs r
+            LEFT JOIN jobs j ON r.job_id = j.id
+            WHERE r.id = ANY(%s)
+        """, ([row['raw_id'] for row in chosen],))
+        rows = {row['raw_id']: dict(row) for row in cur.fetchall()}
+
+    jobs = []
+    for row in chosen:
+        if row['raw_id'] in rows:
+            jobs.append({**rows[row['raw_id']], 'priority': row['priority']})
+    return jobs
 
 
 async def classify_job(raw_job: dict) -> StructuredJob:
@@ -374,35 +402,90 @@ async def sync_job_to_zep(job_id: str, structured: StructuredJob, title: str, co
         return True  # Skip but don't fail
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{API_BASE_URL}/api/graph/jobs",
-                json={
-                    "action": "sync-one",
-                    "jobId": job_id,
-                },
-                headers={
-                    "Authorization": f"Bearer {REVALIDATE_SECRET}",
-                    "Content-Type": "application/json",
-                },
-                timeout=30.0,
-            )
-
-            if response.status_code == 200:
-                return True
-            else:
-                print(f"    ⚠ ZEP sync failed: {response.status_code}")
-                return False
+        response = await http_pool.get_http_client().post(
+            f"{API_BASE_URL}/api/graph/jobs",
+            json={
+                "action": "sync-one",
+                "jobId": job_id,
+            },
+            headers={
+                "Authorization": f"Bearer {REVALIDATE_SECRET}",
+                "Content-Type": "application/json",
+            },
+            timeout=30.0,
+        )
+
+        if response.status_code == 200:
+            return True
+        else:
+            print(f"    ⚠ ZEP sync failed: {response.status_code}")
+            return False
     except Exception as e:
         print(f"    ⚠ ZEP sync error: {str(e)[:50]}")
         return False
 
 
+def load_skill_vocabulary(conn) -> SkillVocabulary:
+    """Seed vocabulary plus everything earlier runs learned"""
+    ensure_skill_tables(conn)
+    vocab = SkillVocabulary()
+    vocab.load(conn)
+    conn.commit()
+    return vocab
+
+
+def rebuild_skills_index(conn):
+    """
+    Canonicalize skills_required on every job and rebuild skill_postings from
+    scratch (active jobs only)
+    """
+    vocab = load_skill_vocabulary(conn)
+    postings: dict[str, list[str]] = {}
+    changed = 0
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, skills_required, is_active FROM jobs WHERE skills_required IS NOT NULL")
+        jobs = cur.fetchall()
+
+    with conn.cursor() as cur:
+        for job_id, skills, is_active in jobs:
+            canonical = vocab.canonicalize(skills, str(job_id))
+            if canonical != skills:
+                cur.execute("UPDATE jobs SET skills_required = %s WHERE id = %s", (canonical, job_id))
+                changed += 1
+            if is_active:
+                for skill in canonical:
+                    postings.setdefault(skill, []).append(str(job_id))
+
+        cur.execute("TRUNCATE skill_postings")
+        cur.executemany(
+            "INSERT INTO skill_postings (skill, job_ids) VALUES (%s, %s)",
+            list(postings.items())
+        )
+
+    vocab.save(conn)
+    conn.commit()
+    print(f"Rebuilt skills index: {len(jobs)} jobs, {changed} rewritten, "
+          f"{len(postings)} skills, {len(vocab.promoted)} promoted")
+
+
+def print_freshness_report(conn, hours: int = 24):
+    """received_at -> processed SLA over recent runs"""
+    report = freshness_report(conn, hours)
+    if not report["count"]:
+        print(f"Freshness ({hours}h): no processed jobs")
+        return
+    print(f"Freshness ({hours}h, {report['count']} jobs): " + ", ".join(
+        f"{k} {format_duration(report[k])}" for k in ("p50", "p90", "p99")
+    ))
+
+
 async def process_jobs(limit: int = 10, source: str = None):
     """Main processing function"""
     conn = get_db_connection()
 
     try:
+        vocab = load_skill_vocabulary(conn)
         jobs = fetch_pending_raw_jobs(conn, limit, source)
         print(f"\n{'='*60}")
         print(f"PYDANTIC AI JOB CLASSIFICATION")
@@ -412,6 +495,8 @@ async def process_jobs(limit: int = 10, source: str = None):
 
         success_count = 0
         error_count = 0
+        # received_at -> processed, seconds, for this run
+        waits = []
 
         for i, job in enumerate(jobs):
             title = job.get('title') or job.get('raw_data', {}).get('job_title', 'Unknown')
@@ -420,14 +505,21 @@ async def process_jobs(limit: int = 10, source: str = None):
             print(f"\n[{i+1}/{len(jobs)}] {title}")
             print(f"    Company: {company}")
             print(f"    Source: {job['source']}")
+            print(f"    Priority: {job['priority']:.1f}")
 
             try:
                 # Classify with Pydantic AI
                 structured = await classify_job(job)
+                structured.skills_required = vocab.canonicalize(
+                    structured.skills_required, str(job['job_id']) if job['job_id'] else None
+                )
 
                 # Update the structured jobs table
                 if job['job_id']:
                     update_structured_job(conn, job['job_id'], structured)
+                    SkillIndex.update_job(
+                        conn, job['job_id'], job.get('previous_skills'), structured.skills_required
+                    )
 
                     # Sync to ZEP knowledge graph
                     zep_synced = await sync_job_to_zep(
@@ -440,6 +532,8 @@ async def process_jobs(limit: int = 10, source: str = None):
                 # Mark as processed
                 mark_raw_job_processed(conn, job['raw_id'], 'processed')
                 conn.commit()
+                if job.get('received_at'):
+                    waits.append(age_hours(job['received_at'], datetime.now(timezone.utc)) * 3600)
 
                 # Print summary
                 print(f"    ✓ Type: {structured.employment_type} {'(Part-Time)' if structured.is_fractional else ''}")
@@ -460,8 +554,24 @@ async def process_jobs(limit: int = 10, source: str = None):
                 error_count += 1
                 continue
 
+        vocab.save(conn)
+        pruned = SkillIndex.prune_inactive(conn)
+        conn.commit()
+
         print(f"\n{'='*60}")
         print(f"COMPLETE: {success_count} processed, {error_count} errors")
+        if pruned:
+            print(f"Skills index: removed inactive jobs from {pruned} skills")
+        if vocab.promoted:
+            print(f"Skills promoted to vocabulary: {', '.join(vocab.promoted)}")
+        if waits:
+            print("Freshness (this run): " + ", ".join(
+                f"{k} {format_duration(v)}" for k, v in percentiles(waits).items()
+            ))
+        print_freshness_report(conn)
+        for host, host_stats in http_pool.stats()["hosts"].items():
+            print(f"HTTP {host}: {host_stats['requests']} requests, {host_stats['reused']} on reused connections, "
+                  f"p50 {host_stats['p50_ms']}ms, p95 {host_stats['p95_ms']}ms")
         print(f"{'='*60}\n")
 
     finally:
@@ -475,9 +585,27 @@ if __name__ == "__main__":
     parser.add_argument('--limit', type=int, default=10, help='Number of jobs to process')
     parser.add_argument('--source', type=str, help='Filter by source (e.g., linkedin, greenhouse)')
     parser.add_argument('--all', action='store_true', help='Process all pending jobs')
+    parser.add_argument('--rebuild-skills-index', action='store_true', help='Canonicalize all existing job skills and rebuild the skill index')
+    parser.add_argument('--freshness-report', type=int, metavar='HOURS', help='Print received->processed percentiles for the last HOURS and exit')
 
     args = parser.parse_args()
 
+    if args.freshness_report is not None:
+        conn = get_db_connection()
+        try:
+            print_freshness_report(conn, args.freshness_report)
+        finally:
+            conn.close()
+        raise SystemExit(0)
+
+    if args.rebuild_skills_index:
+        conn = get_db_connection()
+        try:
+            rebuild_skills_index(conn)
+        finally:
+            conn.close()
+        raise SystemExit(0)
+
     limit = 1000 if args.all else args.limit
 
     print(f"\nStarting Pydantic AI Job Classification...")
@@ -0,0 +1,122 @@
+"""
+Priority and freshness-aware scheduling of pending raw jobs.
+
+Classification slots go to the pending rows most worth classifying first,
+scored from cheap signals (title keywords, source, UK location) plus a
+freshness bonus that decays with age. Rows older than STARVATION_HOURS get a
+boost that grows with age, so low-value rows still drain eventually.
+"""
+import json
+import math
+import os
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+# (pattern, weight) matched against the lower-cased title
+TITLE_KEYWORDS = [
+    (r"\b(fractional|part[- ]time|portfolio)\b", 4.0),
+    (r"\binterim\b", 2.5),
+    (r"\b(cfo|cmo|cto|coo|ceo|cio|ciso|chro|cpo|cro|cdo)\b", 3.0),
+    (r"\bchief\b", 3.0),
+    (r"\b(finance|marketing|technology|operations|people) director\b", 2.0),
+    (r"\b(director|head of|vp|vice president)\b", 1.5),
+    (r"\bnon[- ]executive\b", 1.5),
+    (r"\bfull[- ]time\b", -2.0),
+    (r"\b(intern|internship|graduate|apprentice|junior|trainee)\b", -4.0),
+    (r"\b(assistant|administrator|receptionist)\b", -1.5),
+]
+_TITLE_PATTERNS = [(re.compile(p), w) for p, w in TITLE_KEYWORDS]
+
+UK_MARKERS = re.compile(
+    r"\b(uk|united kingdom|england|scotland|wales|northern ireland|london|manchester|"
+    r"birmingham|leeds|bristol|edinburgh|glasgow|cardiff|belfast|cambridge|oxford|"
+    r"newcastle|liverpool|sheffield|nottingham|reading)\b"
+)
+UK_WEIGHT = 2.0
+
+# Per-source weights, overridable with SCHEDULER_SOURCE_WEIGHTS='{"linkedin": 0.5}'
+SOURCE_WEIGHTS = {"greenhouse": 1.0, "lever": 1.0, "ashby": 1.0, "linkedin": 0.5}
+SOURCE_WEIGHTS.update(json.loads(os.environ.get("SCHEDULER_SOURCE_WEIGHTS", "{}")))
+
+FRESH_BONUS = 3.0
+FRESH_HALF_LIFE_HOURS = float(os.environ.get("SCHEDULER_HALF_LIFE_HOURS", "12"))
+STARVATION_HOURS = float(os.environ.get("SCHEDULER_STARVATION_HOURS", "72"))
+# Priority gained per STARVATION_HOURS waited beyond the threshold
+STARVATION_BOOST = 5.0
+
+# How many of the newest pending rows are scored each run (oldest rows are always included)
+SCAN_LIMIT = int(os.environ.get("SCHEDULER_SCAN_LIMIT", "5000"))
+
+
+def age_hours(received_at: Optional[datetime], now: datetime) -> float:
+    if received_at is None:
+        return 0.0
+    if received_at.tzinfo is None:
+        received_at = received_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (now - received_at).total_seconds() / 3600)
+
+
+def priority(row: dict, now: Optional[datetime] = None) -> float:
+    """Score a pending row; higher is classified sooner"""
+    now = now or datetime.now(timezone.utc)
+    title = (row.get("title") or "").lower()
+    location = (row.get("location") or "").lower()
+    employment = (row.get("employment_type") or "").lower()
+
+    score = sum(w for pattern, w in _TITLE_PATTERNS if pattern.search(title))
+    if "part" in employment or "contract" in employment:
+        score += 1.0
+    if UK_MARKERS.search(location):
+        score += UK_WEIGHT
+    score += SOURCE_WEIGHTS.get((row.get("source") or "").lower(), 0.0)
+
+    age = age_hours(row.get("received_at"), now)
+    score += FRESH_BONUS * math.pow(0.5, age / FRESH_HALF_LIFE_HOURS)
+    if age > STARVATION_HOURS:
+        score += STARVATION_BOOST * (age - STARVATION_HOURS) / STARVATION_HOURS
+    return score
+
+
+def schedule(candidates: list[dict], limit: int, now: Optional[datetime] = None) -> list[dict]:
+    """Pick the `limit` highest-priority candidates, highest first"""
+    now = now or datetime.now(timezone.utc)
+    for row in candidates:
+        row["priority"] = priority(row, now)
+    return sorted(candidates, key=lambda r: r["priority"], reverse=True)[:limit]
+
+
+def percentiles(values: list[float], points=(50, 90, 99)) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        f"p{p}": ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+        for p in points
+    }
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def freshness_report(conn, hours: int = 24) -> dict:
+    """received_at -> processed_at percentiles (seconds) over the last `hours`"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT COUNT(*),
+                   percentile_cont(ARRAY[0.5, 0.9, 0.99]) WITHIN GROUP (
+                       ORDER BY EXTRACT(EPOCH FROM processed_at - received_at)
+                   )
+            FROM raw_jobs
+            WHERE processing_status = 'processed'
+            AND processed_at > NOW() - make_interval(hours => %s)
+        """, (hours,))
+        count, values = cur.fetchone()
+    if not count:
+        return {"count": 0}
+    return {"count": count, **dict(zip(("p50", "p90", "p99"), values))}